@@ -0,0 +1,782 @@
+# almacenamiento.py
+import csv
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+import streamlit as st
+
+from metricas import ContadorLlamadas
+from perfiles import PERFILES
+
+
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+HOJA_POR_DEFECTO = "Catalogo Libros Hijas"
+HOJA_LECTURAS = "lecturas"
+COLUMNAS_LECTURAS = ["perfil", "libro_id", "fecha"]
+HOJA_PERFILES = "perfiles"
+COLUMNAS_PERFILES = ["nombre", "icono"]
+HOJA_ESTADO = "estado_{perfil}"
+COLUMNAS_ESTADO = ["libro_id", "favorito", "veces", "ultima"]
+# Estado de una lectora para un libro que aún no tiene fila
+ESTADO_INICIAL = {"favorito": "FALSE", "veces": "0", "ultima": ""}
+ICONO_POR_DEFECTO = "📖"
+HOJA_REVISION = "revision"
+# Marca del formato de los datos (ver migrar_una_vez)
+FORMATO_ACTUAL = "estado_por_lectora"
+MARCA_MIGRANDO = "migrando"
+# Segundos tras los que una migración en curso se da por abandonada
+ESPERA_MIGRACION = 600
+# Segundos entre marcar una migración y confirmar que la marca es propia
+PAUSA_MIGRACION = 2
+RUTA_SQLITE = "lectura_nocturna.db"
+CSV_SEMILLA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogo_libros.csv")
+
+
+# ---------------- CONFIG ----------------
+def leer_config(hogar=None):
+    """
+    Lee la sección [almacenamiento] de los secrets.
+    La variable de entorno LECTURA_BACKEND tiene prioridad sobre "backend".
+
+    Con un hogar, aplica encima su sección [almacenamiento.hogares.<hogar>]
+    (hoja, ruta, csv, cuota_mb, perfiles...). La hoja y la ruta nunca se
+    heredan de la configuración general, para no mezclar datos de hogares.
+    """
+    try:
+        config = dict(st.secrets.get("almacenamiento", {}))
+    except Exception:
+        # Sin secrets.toml (modo offline)
+        config = {}
+
+    if hogar is not None:
+        hogares = config.get("hogares", {})
+        if hogar not in hogares:
+            raise ValueError(f"Hogar desconocido: {hogar}")
+        config = {k: v for k, v in config.items() if k not in ("hogares", "hoja", "ruta")}
+        config.update(hogares[hogar])
+
+    if os.environ.get("LECTURA_BACKEND"):
+        config["backend"] = os.environ["LECTURA_BACKEND"]
+
+    return config
+
+
+# ---------------- INTERFAZ ----------------
+class RevisionPendiente(Exception):
+    """
+    Los datos de una escritura ya quedaron guardados pero no se pudo subir
+    la revisión: no hay que reenviarlos, solo reintentar subir_revision.
+    """
+
+
+class BackendDatos(ABC):
+    """
+    Interfaz común de almacenamiento del catálogo.
+    Las filas se numeran como en Google Sheets: la fila 1 son los
+    encabezados y los libros empiezan en la fila 2.
+
+    Cada escritura sube la revisión de los datos (un contador); las
+    revisiones que produjo esta instancia quedan en revisiones_escritas.
+    """
+
+    revisiones_escritas = ()
+
+    @abstractmethod
+    def leer_revision(self):
+        """Revisión actual de los datos (una lectura mínima)"""
+        raise NotImplementedError
+
+    def solo_escrituras_propias(self, desde, hasta):
+        """
+        Si todas las revisiones entre desde (excluida) y hasta las produjo
+        este proceso. Sin ese registro, se asume que no.
+        """
+        return desde == hasta
+
+    def subir_revision(self):
+        """Sube la revisión sin escribir datos (reintento tras RevisionPendiente)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_formato(self):
+        """Marca del formato de los datos ("" si no tiene); no es parte de la revisión"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def escribir_formato(self, marca):
+        """Guarda la marca del formato, sin subir la revisión"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_registros(self):
+        """Retorna el catálogo como lista de dicts (uno por libro)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_encabezados(self):
+        """Retorna la lista de nombres de columna"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_celda(self, fila, columna):
+        """Retorna el valor de una celda (columna por nombre)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def escribir_celda(self, fila, columna, valor):
+        """Escribe el valor de una celda (columna por nombre)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def actualizar_celdas(self, cambios):
+        """
+        Escribe varias celdas en una sola operación.
+        cambios: lista de (fila, columna, valor) con la columna por nombre.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def escribir_tabla(self, filas):
+        """Reemplaza la tabla completa; filas[0] son los encabezados"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_lecturas(self):
+        """Retorna el registro de lecturas: lista de {perfil, libro_id, fecha}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def agregar_lectura(self, perfil, libro_id, fecha):
+        """Agrega un evento al final del registro de lecturas (nunca se modifica)"""
+        raise NotImplementedError
+
+    def agregar_lecturas(self, eventos):
+        """Agrega varios eventos (perfil, libro_id, fecha) en orden"""
+        for perfil, libro_id, fecha in eventos:
+            self.agregar_lectura(perfil, libro_id, fecha)
+
+    @abstractmethod
+    def leer_perfiles(self):
+        """Retorna las lectoras registradas: lista de {nombre, icono}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def agregar_perfil(self, nombre, icono):
+        """Registra una lectora"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_estado(self, perfil):
+        """
+        Retorna el estado de una lectora, solo sus filas: lista de
+        {libro_id, favorito, veces, ultima}. Los libros sin fila tienen
+        ESTADO_INICIAL.
+        """
+        raise NotImplementedError
+
+    def leer_estado_libro(self, perfil, libro_id):
+        """Fila de estado de una lectora para un libro (ESTADO_INICIAL si no la tiene)"""
+        for fila in self.leer_estado(perfil):
+            if str(fila["libro_id"]) == str(libro_id):
+                return fila
+        return dict(ESTADO_INICIAL, libro_id=libro_id)
+
+    @abstractmethod
+    def guardar_estado(self, perfil, cambios):
+        """
+        Escribe el estado de una lectora, creando las filas que falten.
+        cambios: lista de (libro_id, campo, valor) con campo de ESTADO_INICIAL.
+        """
+        raise NotImplementedError
+
+
+# ---------------- POOL DE CONEXIONES ----------------
+class PoolSheets:
+    """
+    Cliente gspread autorizado y hojas abiertas, compartidos por todo el
+    proceso. Autoriza y abre cada spreadsheet una sola vez: gspread
+    convierte las credenciales y renueva el token por su cuenta, así que
+    el cliente sirve mientras viva el proceso.
+    crear_cliente reemplaza la autorización (ver sheets_falso).
+    """
+
+    def __init__(self, crear_cliente=None):
+        self._crear_cliente = crear_cliente
+        self._lock = threading.Lock()
+        self._client = None
+        self._hojas = {}
+
+    def _autorizar(self):
+        self._hojas = {}
+        if self._crear_cliente is not None:
+            self._client = ContadorLlamadas(self._crear_cliente(), "sheets")
+            return
+
+        # gspread y oauth2client tardan casi medio segundo en importarse:
+        # solo se cargan si el hogar usa Google Sheets
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(
+            st.secrets["gcp_service_account"],
+            SCOPE
+        )
+        # Cada llamada a la API queda contada (sheets.*) para ver el uso de la cuota
+        self._client = ContadorLlamadas(gspread.authorize(creds), "sheets")
+
+    def hoja(self, nombre_hoja, titulo=None, encabezados=None):
+        """
+        Retorna una hoja del spreadsheet, abriéndolo si hace falta.
+        Sin título retorna la primera hoja; si la hoja con ese título no
+        existe, la crea con los encabezados dados.
+        """
+        from gspread.exceptions import WorksheetNotFound
+
+        with self._lock:
+            if self._client is None:
+                self._autorizar()
+
+            clave = (nombre_hoja, titulo)
+            if clave not in self._hojas:
+                spreadsheet = ContadorLlamadas(self._client.open(nombre_hoja), "sheets")
+                if titulo is None:
+                    self._hojas[clave] = ContadorLlamadas(spreadsheet.get_worksheet(0), "sheets")
+                else:
+                    try:
+                        self._hojas[clave] = ContadorLlamadas(spreadsheet.worksheet(titulo), "sheets")
+                    except WorksheetNotFound:
+                        encabezados = encabezados or []
+                        self._hojas[clave] = ContadorLlamadas(
+                            spreadsheet.add_worksheet(titulo, rows=1, cols=max(len(encabezados), 1)), "sheets"
+                        )
+                        if encabezados:
+                            self._hojas[clave].append_row(encabezados)
+            return self._hojas[clave]
+
+
+@st.cache_resource
+def obtener_pool_sheets():
+    """Pool único por proceso (sobrevive a los reruns de Streamlit)"""
+    return PoolSheets()
+
+
+# ---------------- GOOGLE SHEETS ----------------
+class BackendSheets(BackendDatos):
+    """Catálogo guardado en la primera hoja de un Google Sheet"""
+
+    def __init__(self, nombre_hoja=HOJA_POR_DEFECTO, pool=None):
+        self.nombre_hoja = nombre_hoja
+        self.pool = pool or obtener_pool_sheets()
+        self.hoja = self.pool.hoja(nombre_hoja)
+        self._encabezados = None
+        self.revisiones_escritas = []
+
+    def _hoja_revision(self):
+        return self.pool.hoja(self.nombre_hoja, HOJA_REVISION, [HOJA_REVISION])
+
+    def leer_revision(self):
+        return int(self._hoja_revision().acell("A2").value or 0)
+
+    def leer_formato(self):
+        return self._hoja_revision().acell("B2").value or ""
+
+    def escribir_formato(self, marca):
+        self._hoja_revision().update_acell("B2", marca)
+
+    def subir_revision(self):
+        # Sheets no tiene incremento atómico: dos escrituras simultáneas de
+        # procesos distintos pueden dejar la misma revisión
+        revision = self.leer_revision() + 1
+        self._hoja_revision().update_acell("A2", revision)
+        self.revisiones_escritas.append(revision)
+
+    def _nueva_revision(self):
+        # Los datos ya se escribieron en otra llamada: si falla solo la
+        # revisión, reenviarlos duplicaría las lecturas
+        try:
+            self.subir_revision()
+        except Exception as e:
+            raise RevisionPendiente(str(e)) from e
+
+    def leer_registros(self):
+        return self.hoja.get_all_records()
+
+    def leer_encabezados(self):
+        if self._encabezados is None:
+            self._encabezados = self.hoja.row_values(1)
+        return self._encabezados
+
+    def _indice_columna(self, columna):
+        return self.leer_encabezados().index(columna) + 1
+
+    def leer_celda(self, fila, columna):
+        return self.hoja.cell(fila, self._indice_columna(columna)).value
+
+    def escribir_celda(self, fila, columna, valor):
+        self.hoja.update_cell(fila, self._indice_columna(columna), valor)
+        self._nueva_revision()
+
+    def actualizar_celdas(self, cambios):
+        from gspread.utils import rowcol_to_a1
+
+        # Un solo batch_update con un rango A1 por celda
+        datos = [
+            {
+                "range": rowcol_to_a1(fila, self._indice_columna(columna)),
+                "values": [[valor]]
+            }
+            for fila, columna, valor in cambios
+        ]
+        if datos:
+            self.hoja.batch_update(datos)
+            self._nueva_revision()
+
+    def escribir_tabla(self, filas):
+        from gspread.utils import rowcol_to_a1
+
+        # Primero los valores nuevos y después se limpia lo que sobra de la
+        # tabla anterior (columnas a la derecha, filas abajo): si la
+        # escritura falla, la tabla vieja queda entera
+        alto, ancho = len(filas), max(len(fila) for fila in filas)
+        self.hoja.update(filas)
+        sobrantes = []
+        if self.hoja.col_count > ancho:
+            sobrantes.append(f"{rowcol_to_a1(1, ancho + 1)}:{rowcol_to_a1(self.hoja.row_count, self.hoja.col_count)}")
+        if self.hoja.row_count > alto:
+            sobrantes.append(f"{rowcol_to_a1(alto + 1, 1)}:{rowcol_to_a1(self.hoja.row_count, ancho)}")
+        if sobrantes:
+            self.hoja.batch_clear(sobrantes)
+        self._encabezados = list(filas[0])
+        self._nueva_revision()
+
+    def _hoja_lecturas(self):
+        return self.pool.hoja(self.nombre_hoja, HOJA_LECTURAS, COLUMNAS_LECTURAS)
+
+    def leer_lecturas(self):
+        return self._hoja_lecturas().get_all_records()
+
+    def agregar_lectura(self, perfil, libro_id, fecha):
+        self._hoja_lecturas().append_row([perfil, libro_id, fecha])
+        self._nueva_revision()
+
+    def agregar_lecturas(self, eventos):
+        self._hoja_lecturas().append_rows([list(evento) for evento in eventos])
+        self._nueva_revision()
+
+    def _hoja_perfiles(self):
+        return self.pool.hoja(self.nombre_hoja, HOJA_PERFILES, COLUMNAS_PERFILES)
+
+    def leer_perfiles(self):
+        return self._hoja_perfiles().get_all_records()
+
+    def agregar_perfil(self, nombre, icono):
+        self._hoja_perfiles().append_row([nombre, icono])
+        self._nueva_revision()
+
+    def _hoja_estado(self, perfil):
+        # Una hoja por lectora: leer su estado no descarga el de las demás
+        titulo = HOJA_ESTADO.format(perfil=perfil.lower())
+        return self.pool.hoja(self.nombre_hoja, titulo, COLUMNAS_ESTADO)
+
+    def leer_estado(self, perfil):
+        return self._hoja_estado(perfil).get_all_records()
+
+    def guardar_estado(self, perfil, cambios):
+        from gspread.utils import rowcol_to_a1
+
+        hoja = self._hoja_estado(perfil)
+        filas = {str(libro_id): i + 2 for i, libro_id in enumerate(hoja.col_values(1)[1:])}
+
+        datos = []
+        nuevas = {}
+        for libro_id, campo, valor in cambios:
+            if str(libro_id) in filas:
+                datos.append({
+                    "range": rowcol_to_a1(filas[str(libro_id)], COLUMNAS_ESTADO.index(campo) + 1),
+                    "values": [[valor]]
+                })
+            else:
+                nuevas.setdefault(str(libro_id), dict(ESTADO_INICIAL, libro_id=libro_id))[campo] = valor
+
+        if datos:
+            hoja.batch_update(datos)
+        if nuevas:
+            hoja.append_rows([[fila[c] for c in COLUMNAS_ESTADO] for fila in nuevas.values()])
+        self._nueva_revision()
+
+
+# ---------------- SQLITE LOCAL ----------------
+def _q(nombre):
+    """Cita un identificador SQL"""
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+class ConexionSQLite:
+    """
+    Conexión a un archivo SQLite compartida por todo el proceso. Las
+    transacciones de hilos distintos no deben mezclarse en la misma
+    conexión: todo el acceso pasa por lock.
+    """
+
+    def __init__(self, ruta):
+        self.conn = sqlite3.connect(ruta, check_same_thread=False)
+        # RLock: una escritura lee los encabezados dentro de su transacción
+        self.lock = threading.RLock()
+        self.preparada = False
+
+
+_conexiones_sqlite = {}
+_lock_conexiones = threading.Lock()
+
+
+def conexion_sqlite(ruta):
+    """Conexión única por proceso a cada archivo (se abre la primera vez)"""
+    ruta = os.path.abspath(ruta)
+    with _lock_conexiones:
+        if ruta not in _conexiones_sqlite:
+            _conexiones_sqlite[ruta] = ConexionSQLite(ruta)
+        return _conexiones_sqlite[ruta]
+
+
+class BackendSQLite(BackendDatos):
+    """
+    Catálogo guardado en un archivo SQLite local.
+    Si la base está vacía se siembra desde catalogo_libros.csv, agregando
+    las columnas por perfil que la app necesita. Los valores se guardan
+    como texto, igual que en la hoja, y get_df se encarga de los tipos.
+    Todas las instancias de un mismo archivo comparten la conexión, y las
+    tablas se crean una sola vez por proceso.
+    """
+
+    def __init__(self, ruta=RUTA_SQLITE, csv_semilla=CSV_SEMILLA):
+        self.ruta = ruta
+        conexion = conexion_sqlite(ruta)
+        self.conn = conexion.conn
+        self._lock = conexion.lock
+        self.revisiones_escritas = []
+        with self._lock:
+            if not conexion.preparada:
+                self._preparar(csv_semilla)
+                conexion.preparada = True
+
+    def _preparar(self, csv_semilla):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER)")
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('revision', 0)")
+        if not self._existe_tabla():
+            self._sembrar(csv_semilla)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS lecturas (perfil TEXT, libro_id INTEGER, fecha TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS perfiles (nombre TEXT PRIMARY KEY, icono TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS estado_lectoras ("
+                "perfil TEXT, libro_id INTEGER, favorito TEXT DEFAULT 'FALSE', "
+                "veces TEXT DEFAULT '0', ultima TEXT DEFAULT '', "
+                "PRIMARY KEY (perfil, libro_id))"
+            )
+
+    def _existe_tabla(self):
+        fila = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'catalogo'"
+        ).fetchone()
+        return fila is not None
+
+    def _sembrar(self, csv_semilla):
+        with open(csv_semilla, newline="", encoding="utf-8") as f:
+            filas = list(csv.reader(f))
+
+        encabezados = filas[0]
+        datos = [fila + [""] * (len(encabezados) - len(fila)) for fila in filas[1:]]
+
+        # Columnas del reto semanal por perfil (el estado de lectura va aparte)
+        for perfil in PERFILES:
+            p = perfil.lower()
+            extras = {
+                f"reto_{p}": "",
+                f"reto_{p}_semana": "",
+            }
+            for columna, valor in extras.items():
+                if columna not in encabezados:
+                    encabezados.append(columna)
+                    for fila in datos:
+                        fila.append(valor)
+
+        self.escribir_tabla([encabezados] + datos)
+
+    def leer_revision(self):
+        with self._lock:
+            return self.conn.execute("SELECT valor FROM meta WHERE clave = 'revision'").fetchone()[0]
+
+    def leer_formato(self):
+        with self._lock:
+            fila = self.conn.execute("SELECT valor FROM meta WHERE clave = 'formato'").fetchone()
+        return fila[0] if fila else ""
+
+    def escribir_formato(self, marca):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('formato', ?)", (marca,))
+
+    def subir_revision(self):
+        with self._lock, self.conn:
+            self._nueva_revision()
+
+    def _nueva_revision(self):
+        # Dentro de la transacción de la escritura
+        self.conn.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'revision'")
+        self.revisiones_escritas.append(self.leer_revision())
+
+    def leer_registros(self):
+        with self._lock:
+            cursor = self.conn.execute("SELECT * FROM catalogo ORDER BY rowid")
+            columnas = [d[0] for d in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    def leer_encabezados(self):
+        with self._lock:
+            cursor = self.conn.execute("SELECT * FROM catalogo LIMIT 0")
+            return [d[0] for d in cursor.description]
+
+    def leer_celda(self, fila, columna):
+        with self._lock:
+            resultado = self.conn.execute(
+                f"SELECT {_q(columna)} FROM catalogo WHERE rowid = ?", (fila - 1,)
+            ).fetchone()
+        return resultado[0] if resultado else None
+
+    def _asegurar_columnas(self, columnas):
+        existentes = self.leer_encabezados()
+        for columna in columnas:
+            if columna not in existentes:
+                self.conn.execute(f"ALTER TABLE catalogo ADD COLUMN {_q(columna)} TEXT DEFAULT ''")
+                existentes.append(columna)
+
+    def escribir_celda(self, fila, columna, valor):
+        self.actualizar_celdas([(fila, columna, valor)])
+
+    def actualizar_celdas(self, cambios):
+        with self._lock:
+            self._asegurar_columnas({columna for _, columna, _ in cambios})
+            with self.conn:
+                for fila, columna, valor in cambios:
+                    self.conn.execute(
+                        f"UPDATE catalogo SET {_q(columna)} = ? WHERE rowid = ?",
+                        (str(valor), fila - 1)
+                    )
+                self._nueva_revision()
+
+    def escribir_tabla(self, filas):
+        encabezados = [str(c) for c in filas[0]]
+        columnas_sql = ", ".join(f"{_q(c)} TEXT" for c in encabezados)
+        marcadores = ", ".join("?" for _ in encabezados)
+
+        with self._lock, self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS catalogo")
+            self.conn.execute(f"CREATE TABLE catalogo ({columnas_sql})")
+            self.conn.executemany(
+                f"INSERT INTO catalogo VALUES ({marcadores})",
+                [[str(v) for v in fila] for fila in filas[1:]]
+            )
+            self._nueva_revision()
+
+    def leer_lecturas(self):
+        with self._lock:
+            cursor = self.conn.execute("SELECT perfil, libro_id, fecha FROM lecturas ORDER BY rowid")
+            return [dict(zip(COLUMNAS_LECTURAS, fila)) for fila in cursor.fetchall()]
+
+    def agregar_lectura(self, perfil, libro_id, fecha):
+        self.agregar_lecturas([(perfil, libro_id, fecha)])
+
+    def agregar_lecturas(self, eventos):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO lecturas (perfil, libro_id, fecha) VALUES (?, ?, ?)",
+                [(perfil, int(libro_id), fecha) for perfil, libro_id, fecha in eventos]
+            )
+            self._nueva_revision()
+
+    def leer_perfiles(self):
+        with self._lock:
+            cursor = self.conn.execute("SELECT nombre, icono FROM perfiles ORDER BY rowid")
+            return [dict(zip(COLUMNAS_PERFILES, fila)) for fila in cursor.fetchall()]
+
+    def agregar_perfil(self, nombre, icono):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO perfiles VALUES (?, ?)", (nombre, icono))
+            self._nueva_revision()
+
+    def leer_estado(self, perfil):
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT libro_id, favorito, veces, ultima FROM estado_lectoras WHERE perfil = ?",
+                (perfil.lower(),)
+            )
+            return [dict(zip(COLUMNAS_ESTADO, fila)) for fila in cursor.fetchall()]
+
+    def leer_estado_libro(self, perfil, libro_id):
+        with self._lock:
+            fila = self.conn.execute(
+                "SELECT libro_id, favorito, veces, ultima FROM estado_lectoras WHERE perfil = ? AND libro_id = ?",
+                (perfil.lower(), int(libro_id))
+            ).fetchone()
+        if fila is None:
+            return dict(ESTADO_INICIAL, libro_id=libro_id)
+        return dict(zip(COLUMNAS_ESTADO, fila))
+
+    def guardar_estado(self, perfil, cambios):
+        perfil = perfil.lower()
+        with self._lock, self.conn:
+            for libro_id, campo, valor in cambios:
+                if campo not in ESTADO_INICIAL:
+                    raise KeyError(f"Campo de estado desconocido: {campo}")
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO estado_lectoras (perfil, libro_id) VALUES (?, ?)",
+                    (perfil, int(libro_id))
+                )
+                self.conn.execute(
+                    f"UPDATE estado_lectoras SET {_q(campo)} = ? WHERE perfil = ? AND libro_id = ?",
+                    (str(valor), perfil, int(libro_id))
+                )
+            self._nueva_revision()
+
+
+# ---------------- FÁBRICA ----------------
+def crear_backend(hogar=None):
+    """
+    Crea el backend del hogar configurado en [almacenamiento] de los secrets:
+    - backend = "sheets" (por defecto) usa Google Sheets (hoja = "...")
+    - backend = "sqlite" usa un archivo local (ruta = "...")
+    - backend = "sheets_falso" usa un Google Sheets en memoria, con
+      latencia y errores de cuota configurables (ver sheets_falso)
+    Sin hogar se usa la configuración general. Un hogar con Sheets debe
+    indicar su hoja; con SQLite, si no indica ruta, usa una propia.
+    Las escrituras van directo al backend; ver sheets.get_backend para la
+    versión con escritura diferida.
+    """
+    config = leer_config(hogar)
+    tipo = config.get("backend", "sheets")
+
+    if tipo in ("sheets", "sheets_falso"):
+        if hogar is not None and "hoja" not in config:
+            raise ValueError(f"El hogar {hogar} no tiene hoja configurada")
+        pool = None
+        if tipo == "sheets_falso":
+            from sheets_falso import obtener_pool_falso
+            pool = obtener_pool_falso(
+                config.get("latencia_ms", 0), config.get("jitter_ms", 0),
+                config.get("prob_cuota", 0.0), config.get("cuota_por_minuto", 0),
+                config.get("csv", CSV_SEMILLA)
+            )
+        return BackendSheets(config.get("hoja", HOJA_POR_DEFECTO), pool)
+    if tipo == "sqlite":
+        ruta_hogar = RUTA_SQLITE if hogar is None else f"lectura_nocturna_{hogar}.db"
+        return BackendSQLite(config.get("ruta", ruta_hogar), config.get("csv", CSV_SEMILLA))
+
+    raise ValueError(f"Backend de almacenamiento desconocido: {tipo}")
+
+
+# ---------------- PERFILES Y MIGRACIÓN ----------------
+def asegurar_perfiles(backend, iniciales=PERFILES):
+    """
+    Lectoras registradas como dict {nombre: icono}. Si no hay ninguna,
+    registra las iniciales (por defecto perfiles.PERFILES).
+    """
+    perfiles = {str(p["nombre"]): str(p["icono"]) for p in backend.leer_perfiles()}
+    if not perfiles:
+        for nombre, icono in iniciales.items():
+            backend.agregar_perfil(nombre, icono)
+        perfiles = dict(iniciales)
+    return perfiles
+
+
+def columnas_formato_ancho(encabezados):
+    """
+    Columnas por perfil del formato anterior del catálogo
+    (favorito_<perfil>, veces_<perfil>, ultima_<perfil>).
+    Retorna {perfil: {campo: columna}}. Solo cuenta los perfiles con las
+    tres columnas, para no confundir ultima_lectura o veces_leido.
+    """
+    anchas = {}
+    for columna in encabezados:
+        for campo in ESTADO_INICIAL:
+            if columna.startswith(f"{campo}_"):
+                anchas.setdefault(columna[len(campo) + 1:], {})[campo] = columna
+    return {p: columnas for p, columnas in anchas.items() if len(columnas) == len(ESTADO_INICIAL)}
+
+
+def migrar_formato_ancho(backend):
+    """
+    Pasa el estado de lectura del formato ancho (tres columnas por perfil
+    en el catálogo) a la tabla de estado por lectora, registra las
+    lectoras que falten y reescribe el catálogo sin esas columnas.
+    Retorna la cantidad de filas de estado migradas (0 si no había nada).
+    """
+    encabezados = backend.leer_encabezados()
+    anchas = columnas_formato_ancho(encabezados)
+    if not anchas:
+        return 0
+
+    registros = backend.leer_registros()
+    registrados = {str(perfil["nombre"]).lower() for perfil in backend.leer_perfiles()}
+    conocidos = {nombre.lower(): (nombre, icono) for nombre, icono in PERFILES.items()}
+
+    migradas = 0
+    for p, columnas in anchas.items():
+        if p not in registrados:
+            backend.agregar_perfil(*conocidos.get(p, (p.capitalize(), ICONO_POR_DEFECTO)))
+
+        cambios = []
+        for registro in registros:
+            valores = {campo: str(registro.get(columna, "")) for campo, columna in columnas.items()}
+            leido = valores.get("veces", "0") not in ("", "0")
+            favorito = valores.get("favorito", "").upper() in ("TRUE", "1", "SI", "YES")
+            if leido or favorito or valores.get("ultima"):
+                cambios.extend((registro["id"], campo, valor) for campo, valor in valores.items())
+                migradas += 1
+        if cambios:
+            backend.guardar_estado(p, cambios)
+
+    quitar = {columna for columnas in anchas.values() for columna in columnas.values()}
+    conservar = [c for c in encabezados if c not in quitar]
+    backend.escribir_tabla([conservar] + [[r.get(c, "") for c in conservar] for r in registros])
+
+    return migradas
+
+
+def migrar_una_vez(backend, pausa=PAUSA_MIGRACION):
+    """
+    Corre migrar_formato_ancho salvo que el backend ya tenga la marca del
+    formato actual. Antes de migrar deja una marca "en curso" propia y,
+    tras una pausa, confirma que sigue siendo la suya: si otro proceso
+    arrancó a la vez, migra solo uno. Una marca en curso de hace más de
+    ESPERA_MIGRACION segundos se da por abandonada.
+    Retorna la cantidad de filas de estado migradas.
+    """
+    marca = backend.leer_formato()
+    if marca == FORMATO_ACTUAL:
+        return 0
+    if marca.startswith(MARCA_MIGRANDO):
+        inicio = float(marca.split(":")[1])
+        if time.time() - inicio < ESPERA_MIGRACION:
+            return 0
+
+    propia = f"{MARCA_MIGRANDO}:{time.time()}:{uuid.uuid4().hex}"
+    backend.escribir_formato(propia)
+    time.sleep(pausa)
+    if backend.leer_formato() != propia:
+        return 0
+
+    migradas = migrar_formato_ancho(backend)
+    backend.escribir_formato(FORMATO_ACTUAL)
+    return migradas
@@ -1,18 +1,28 @@
 # app_libros.py
+import json
+import os
 import streamlit as st
 import pandas as pd
-from sheets import get_df, get_columnas_perfil
+from sheets import (
+    get_backend, get_columnas_perfil, get_carga, get_revision, actualizar_libro, refrescar_estado_libro,
+    get_estado, get_perfiles, registrar_perfil, tiene_perfil, agregar_columnas_perfil, migrar_hogar,
+    backend_revision
+)
 from datetime import datetime
 
-from eleccion_libros import seleccionar_libro, obtener_mensaje_modo
-from estilos import aplicar_tema_infantil, ruleta_magica, mostrar_portada
-from gamificacion import (
-    obtener_nivel, calcular_racha, obtener_logros_desbloqueados,
-    verificar_nuevo_logro, LOGROS
-)
-from perfiles import pagina_perfil, inicializar_avatar_state
-from historial import pagina_historial, mostrar_logros
+from eleccion_libros import obtener_mensaje_modo, IndiceCatalogo, MotorSeleccion, reproducir_giros, coinciden_giros
+from estilos import aplicar_tema_infantil, ruleta_magica, revelar_con_retraso, mostrar_portada
+from portadas import precargar_portadas
+from gamificacion import EstadisticasPerfil, verificar_nuevos_logros, LOGROS
+from perfiles import AVATARES_POR_DEFECTO, pagina_perfil, inicializar_avatar_state
+from historial import pagina_historial, mostrar_logros, lecturas_recientes
 from retos import mostrar_reto_semanal, verificar_reto_completado
+from plan_semana import pagina_plan
+from lecturas import construir_registro, incorporar_anteriores, registrar_lectura
+from hogares import resolver_hogar, cache_hogar, perfiles_iniciales
+from instantaneas import cargar_catalogo_hogar, reconciliando, revision_datos
+from cola_escritura import obtener_cola
+from metricas import iniciar_rerun, mostrar_panel_metricas, panel_visible, tramo
 
 # ---------------- CONFIG ----------------
 st.set_page_config(
@@ -21,51 +31,181 @@ st.set_page_config(
     layout="centered"
 )
 
+# ---------------- MÉTRICAS ----------------
+# Tiempos y llamadas al backend de cada rerun (panel con ?debug=1)
+iniciar_rerun()
+
 # ---------------- APLICAR TEMA ----------------
 aplicar_tema_infantil()
 
 # ---------------- SESSION STATE ----------------
 if "libro_actual" not in st.session_state:
     st.session_state.libro_actual = None
-if "nuevo_logro" not in st.session_state:
-    st.session_state.nuevo_logro = None
+if "nuevos_logros" not in st.session_state:
+    st.session_state.nuevos_logros = []
+if "proximo_logro" not in st.session_state:
+    st.session_state.proximo_logro = None
 if "reto_recien_completado" not in st.session_state:
     st.session_state.reto_recien_completado = None
+if "motor" not in st.session_state:
+    # LECTURA_SEMILLA fija la secuencia de giros (benchmarks y repeticiones)
+    semilla = os.environ.get("LECTURA_SEMILLA")
+    st.session_state.motor = MotorSeleccion(int(semilla) if semilla else None)
+
+# ---------------- HOGAR ----------------
+# Cada hogar tiene su catálogo, sus lectoras y su partición de caché
+hogar = resolver_hogar()
+cache = cache_hogar(hogar)
+# Catálogos con el formato anterior (columnas por perfil) se migran al abrir el hogar
+migrar_hogar(hogar)
 
-inicializar_avatar_state()
 
-# ---------------- PERFILES ----------------
-PERFILES = {
-    "Clara": "🐭",
-    "Gracia": "🐥"
-}
+def clave_hogar(clave):
+    """Clave de precarga de portadas propia del hogar"""
+    return f"{hogar or ''}/{clave}"
+
 
 # ---------------- DATA ----------------
-@st.cache_data(ttl=60)
+# Lo cacheado del hogar va con la revisión de los datos: solo se recarga
+# si alguien más escribió desde la última carga
+CACHES_CON_REVISION = {"catalogo", "perfiles", "lecturas"}
+# Recarga de respaldo: en Google Sheets dos procesos pueden escribir la
+# misma revisión y cada uno la toma como propia
+TTL_RESPALDO = 15 * 60
+
+
+def comprobar_revision():
+    """
+    Lee la revisión de los datos del hogar (una lectura mínima por rerun).
+    Si desde la carga del catálogo solo hubo escrituras de esta app, que ya
+    están aplicadas en memoria, lo cacheado pasa a la revisión nueva sin
+    recargarse.
+    """
+    backend = backend_revision(hogar)
+    revision = backend.leer_revision()
+    anterior = cache.version(("catalogo",))
+    if anterior is not None and anterior != revision and backend.solo_escrituras_propias(anterior, revision):
+        cache.revalidar(CACHES_CON_REVISION, anterior, revision)
+    return revision
+
+
+revision = comprobar_revision()
+
+
+@tramo("cargar_datos")
 def cargar_datos():
-    df, _ = get_df()
+    """
+    Catálogo del hogar, compartido (no copiado) entre reruns: las escrituras
+    de la app lo actualizan en el lugar. No modificarlo salvo con
+    actualizar_libro (o cargar_catalogo, que agrega las columnas de cada perfil).
+    Al arrancar sale de la instantánea en disco si la hay (ver instantaneas).
+    Es fijo en la caché del hogar: la cuota nunca lo desaloja.
+    """
+    clave = ("catalogo",)
+    guardada = cache.version(clave)
+    # Mientras se reconcilia una instantánea vieja se sigue usando esa
+    version = guardada if reconciliando(hogar) else revision
+    # Si la revisión no cambió, la recarga es la de respaldo (ttl): la
+    # instantánea, de la misma revisión, no traería nada nuevo
+    usar_instantanea = guardada != revision
+    # Al reemplazar un catálogo cacheado solo sirve una instantánea al día
+    solo_vigente = guardada is not None
+    return cache.obtener(
+        clave,
+        lambda: cargar_catalogo_hogar(hogar, revision, cache, usar_instantanea, solo_vigente),
+        version=version,
+        ttl=TTL_RESPALDO,
+        fija=True,
+        version_de=revision_datos
+    )
+
+
+def cargar_perfiles():
+    """Lectoras registradas del hogar {nombre: icono}"""
+    return cache.obtener(
+        ("perfiles",),
+        lambda: get_perfiles(get_backend(hogar), perfiles_iniciales(hogar)),
+        version=revision,
+        ttl=TTL_RESPALDO
+    )
+
+
+def cargar_catalogo(perfil):
+    """
+    Catálogo compartido con las columnas del perfil. El estado de cada
+    lectora se descarga (solo sus filas) la primera vez que se usa.
+    """
+    df = cargar_datos()
+    if not tiene_perfil(df, perfil):
+        agregar_columnas_perfil(df, perfil, get_estado(get_backend(hogar), perfil))
     return df
 
 
+def obtener_indice(df):
+    """Índice de candidatos de la ruleta para la revisión actual del catálogo"""
+    return cache.obtener(("indice",), lambda: IndiceCatalogo(df), version=(get_carga(df), get_revision(df)))
+
+
+def cargar_lecturas():
+    """Registro de lecturas con agregados por perfil (se actualiza en memoria al leer)"""
+    return cache.obtener(
+        ("lecturas",),
+        lambda: construir_registro(get_backend(hogar).leer_lecturas(), cargar_datos()),
+        version=revision,
+        ttl=TTL_RESPALDO
+    )
+
+
+def obtener_resumen(df, perfil):
+    """Resumen de lecturas del perfil (df ya debe tener sus columnas)"""
+    registro = cargar_lecturas()
+    incorporar_anteriores(registro, df, perfil)
+    return registro.perfil(perfil)
+
+
 def obtener_df_perfil(df, perfil):
-    """Obtiene datos filtrados y renombrados para un perfil"""
+    """
+    Libros que leyó el perfil, con sus columnas también como favorito,
+    veces_leido y ultima_lectura. Se arma una vez por carga y revisión
+    del catálogo y se comparte entre páginas: no modificarlo.
+    """
+    return cache.obtener(
+        ("df_perfil", perfil),
+        lambda: armar_df_perfil(df, perfil),
+        version=(get_carga(df), get_revision(df))
+    )
+
+
+def armar_df_perfil(df, perfil):
+    """Filtra primero los libros leídos: no copia el catálogo entero"""
     cols = get_columnas_perfil(perfil)
-    
-    # Crear copia con columnas renombradas para compatibilidad
-    df_perfil = df.copy()
-    df_perfil["favorito"] = df_perfil[cols["favorito"]]
-    df_perfil["veces_leido"] = df_perfil[cols["veces"]]
-    df_perfil["ultima_lectura"] = df_perfil[cols["ultima"]]
-    
-    # Filtrar solo libros que este perfil ha leído
-    return df_perfil[df_perfil["veces_leido"] > 0]
+    leidos = df[df[cols["veces"]] > 0]
+    return leidos.assign(
+        favorito=leidos[cols["favorito"]],
+        veces_leido=leidos[cols["veces"]],
+        ultima_lectura=leidos[cols["ultima"]]
+    )
+
+
+def obtener_estadisticas(df, perfil, resumen):
+    """
+    Estadísticas del perfil, calculadas una vez por versión de los datos:
+    cambian con la carga y la revisión del catálogo, las lecturas
+    registradas y el día.
+    """
+    version = (get_carga(df), get_revision(df), resumen.carga, resumen.total, datetime.now().date())
+    return cache.obtener(
+        ("estadisticas", perfil),
+        lambda: EstadisticasPerfil(obtener_df_perfil(df, perfil), resumen),
+        version=version
+    )
 
 
 # ---------------- WIDGET DE RACHA ----------------
-def mostrar_widget_racha(df_perfil, perfil):
+def mostrar_widget_racha(estadisticas):
     """Widget motivacional de racha"""
     
-    racha = calcular_racha(df_perfil)
+    racha = estadisticas.racha
     
     if racha == 0:
         mensaje = "¡Hoy es un buen día para leer! 📖"
@@ -105,27 +245,56 @@ with st.sidebar:
     
     st.divider()
     
+    # Escrituras que el backend no acepta hace rato: siguen en la cola y se reintentan
+    if obtener_cola(hogar).atascada():
+        st.warning("⏳ Hay cambios que todavía no se pudieron guardar. Se siguen intentando: no cierres la app.")
+    
+    perfiles = cargar_perfiles()
     perfil = st.radio(
         "¿Quién eres?",
-        list(PERFILES.keys()),
-        format_func=lambda x: f"{PERFILES[x]} {x}"
+        list(perfiles.keys()),
+        format_func=lambda x: f"{perfiles[x]} {x}"
     )
+    inicializar_avatar_state(perfiles)
+    
+    with st.expander("➕ Nueva lectora", expanded=not perfiles):
+        nombre_nuevo = st.text_input("Nombre", key="nombre_nueva_lectora")
+        icono_nuevo = st.selectbox("Icono", AVATARES_POR_DEFECTO["opciones"], key="icono_nueva_lectora")
+        if st.button("Agregar", key="btn_nueva_lectora"):
+            try:
+                with tramo("registrar_perfil"):
+                    registrar_perfil(get_backend(hogar), nombre_nuevo, icono_nuevo)
+                cache.invalidar("perfiles")
+                st.rerun()
+            except ValueError as e:
+                st.warning(str(e))
+    
+    # Un hogar nuevo empieza sin lectoras
+    if perfil is None:
+        st.info("👋 Agrega una lectora para empezar.")
+        st.stop()
     
     st.divider()
     
     pagina = st.radio(
         "🧭 Menú",
-        ["🎡 Ruleta", "📖 Mi Diario", "👤 Mi Perfil", "🏆 Logros"],
+        ["🎡 Ruleta", "🗓️ Plan", "📖 Mi Diario", "👤 Mi Perfil", "🏆 Logros"],
         label_visibility="collapsed"
     )
     
     # Mini-stats en sidebar
-    df_sidebar = cargar_datos()
+    df_sidebar = cargar_catalogo(perfil)
     df_perfil_sidebar = obtener_df_perfil(df_sidebar, perfil)
+    resumen_perfil = obtener_resumen(df_sidebar, perfil)
+    estadisticas_perfil = obtener_estadisticas(df_sidebar, perfil, resumen_perfil)
     
     if not df_perfil_sidebar.empty:
-        nivel = obtener_nivel(df_perfil_sidebar["veces_leido"].sum())
-        racha = calcular_racha(df_perfil_sidebar)
+        # Portadas del diario listas antes de abrirlo
+        if "portada_url" in df_perfil_sidebar.columns:
+            precargar_portadas(clave_hogar(f"diario_{perfil}"), lecturas_recientes(df_perfil_sidebar)["portada_url"], 80)
+        
+        nivel = estadisticas_perfil.nivel
+        racha = estadisticas_perfil.racha
         
         st.divider()
         st.markdown(f"""
@@ -138,19 +307,23 @@ with st.sidebar:
 
 
 # ---------------- PÁGINA RULETA ----------------
+@tramo("pagina_ruleta")
 def pagina_ruleta():
     st.title("📖 Noche de Lectura")
     
-    df = cargar_datos()
+    df = cargar_catalogo(perfil)
+    indice = obtener_indice(df)
     df_perfil = obtener_df_perfil(df, perfil)
     cols = get_columnas_perfil(perfil)
     
+    resumen = obtener_resumen(df, perfil)
+    
     # Widget de racha
-    mostrar_widget_racha(df_perfil, perfil)
+    mostrar_widget_racha(obtener_estadisticas(df, perfil, resumen))
     
     # Reto semanal
-    _, sheet = get_df()
-    reto = mostrar_reto_semanal(df_perfil, perfil, sheet)
+    backend = get_backend(hogar)
+    reto = mostrar_reto_semanal(df_perfil, perfil, backend, resumen, rng=st.session_state.motor.flujo("reto"))
     
     # Celebraciones
     if st.session_state.reto_recien_completado:
@@ -159,11 +332,18 @@ def pagina_ruleta():
         st.success(f"🎉 ¡Completaste el reto: {reto_info['nombre']}! Premio: {reto_info['recompensa']}")
         st.session_state.reto_recien_completado = None
     
-    if st.session_state.nuevo_logro:
-        logro = LOGROS[st.session_state.nuevo_logro]
+    if st.session_state.nuevos_logros:
         st.balloons()
-        st.success(f"🏆 ¡Desbloqueaste: {logro['icono']} {logro['nombre']}!")
-        st.session_state.nuevo_logro = None
+        for clave in st.session_state.nuevos_logros:
+            logro = LOGROS[clave]
+            st.success(f"🏆 ¡Desbloqueaste: {logro['icono']} {logro['nombre']}!")
+        st.session_state.nuevos_logros = []
+    
+    if st.session_state.proximo_logro:
+        clave, valor, meta = st.session_state.proximo_logro
+        logro = LOGROS[clave]
+        st.info(f"{logro['icono']} Próximo logro: **{logro['nombre']}** ({valor}/{meta})")
+        st.session_state.proximo_logro = None
     
     st.divider()
     
@@ -195,17 +375,32 @@ def pagina_ruleta():
     else:
         max_duracion, solo_favoritos, solo_nuevos, modo_key = None, False, False, "default"
     
+    filtros = dict(
+        max_duracion=max_duracion,
+        permitir_interactivo=True, 
+        solo_favoritos=solo_favoritos,
+        solo_nuevos=solo_nuevos
+    )
+    
+    # Precargar en segundo plano las portadas de los ganadores más probables
+    # (solo cuando cambian los filtros o el catálogo)
+    clave_precarga = (perfil, edad, modo_key, get_revision(df))
+    if modo_key != "elegir" and st.session_state.get("clave_precarga") != clave_precarga:
+        st.session_state.clave_precarga = clave_precarga
+        mascara = indice.candidatos(perfil, edad, **filtros)
+        precargar_portadas(
+            clave_hogar(f"ruleta_{perfil}"),
+            indice.portadas_probables(perfil, mascara, solo_favoritos=solo_favoritos, solo_nuevos=solo_nuevos),
+            180
+        )
+    
     # --- MODO ELEGIR MANUALMENTE ---
     if modo == "📋 Elegir":
         st.markdown("")
         st.subheader("📚 Elige un libro")
         
         # Filtrar libros activos y de edad apropiada
-        df_elegibles = df[
-            (df["activa"] == True) &
-            (df["edad_min"] <= edad) &
-            (df["edad_max"] >= edad)
-        ].sort_values("titulo")
+        df_elegibles = df[indice.por_edad(edad)].sort_values("titulo")
         
         if df_elegibles.empty:
             st.warning("No hay libros disponibles para esta edad.")
@@ -230,18 +425,17 @@ def pagina_ruleta():
     else:
         st.markdown("")
         if st.button("🎡 ¡Girar la ruleta!", use_container_width=True):
-            cargar_datos.clear()
-            df = cargar_datos()
+            df = cargar_catalogo(perfil)
+            indice = obtener_indice(df)
             
-            libro = seleccionar_libro(
-                df, 
-                perfil=perfil,  # NUEVO: pasar perfil
-                edad_nina=edad, 
-                max_duracion=max_duracion,
-                permitir_interactivo=True, 
-                solo_favoritos=solo_favoritos,
-                solo_nuevos=solo_nuevos
-            )
+            with tramo("seleccionar_libro"):
+                libro = st.session_state.motor.girar(
+                    df, 
+                    perfil=perfil,  # NUEVO: pasar perfil
+                    edad_nina=edad, 
+                    indice=indice,
+                    **filtros
+                )
             
             if libro is None:
                 st.session_state.libro_actual = None
@@ -254,21 +448,14 @@ def pagina_ruleta():
                 libro_dict["veces_leido"] = libro[cols["veces"]]
                 st.session_state.libro_actual = libro_dict
                 
-                df_filtrado = df[
-                    (df["edad_min"] <= edad) & (df["edad_max"] >= edad) & (df["activa"] == True)
-                ]
-                if solo_favoritos:
-                    df_filtrado = df_filtrado[df_filtrado[cols["favorito"]] == True]
-                elif solo_nuevos:
-                    df_filtrado = df_filtrado[df_filtrado[cols["veces"]] == 0]
-                elif max_duracion:
-                    df_filtrado = df_filtrado[df_filtrado["duracion_min"] <= max_duracion]
-                
-                titulos = df_filtrado["titulo"].tolist()
+                # Mismos candidatos que la selección, desde el índice
+                titulos = indice.titulos_de(indice.candidatos(perfil, edad, **filtros))
                 if len(titulos) < 3:
                     titulos = titulos * 3
                 
-                ruleta_magica(titulos, libro["titulo"])
+                # La animación corre en el navegador; la tarjeta espera a que termine
+                ruleta_magica(titulos, libro["titulo"], rng=st.session_state.motor.flujo("ruleta"))
+                revelar_con_retraso("tarjeta_libro")
                 st.balloons()
     
     # --- MOSTRAR LIBRO SELECCIONADO ---
@@ -277,7 +464,7 @@ def pagina_ruleta():
         es_favorito = libro.get("favorito", False)
         estrella = "⭐" if es_favorito else ""
         
-        with st.container(border=True):
+        with st.container(border=True, key="tarjeta_libro"):
             col_izq, col_centro, col_der = st.columns([1, 2, 1])
             with col_centro:
                 portada_url = libro.get("portada_url", "")
@@ -286,7 +473,7 @@ def pagina_ruleta():
             st.markdown(f"<h2 style='text-align: center; color: #d63384;'>{libro['titulo']} {estrella}</h2>", unsafe_allow_html=True)
             
             col_info1, col_info2, col_info3 = st.columns(3)
-            col_info1.metric("👧 Lectora", f"{PERFILES[perfil]} {perfil}")
+            col_info1.metric("👧 Lectora", f"{perfiles[perfil]} {perfil}")
             col_info2.metric("⏱️ Duración", f"{libro['duracion_min']} min")
             col_info3.metric("📍 Ubicación", libro["ubicacion"])
         
@@ -295,42 +482,55 @@ def pagina_ruleta():
         with col1:
             btn_text = "💖 ¡Ya es favorito!" if es_favorito else "⭐ ¡Es mi favorito!"
             if st.button(btn_text, key="btn_fav", use_container_width=True, disabled=es_favorito):
-                df_fresh, sheet = get_df()
-                # Actualizar columna del perfil
-                df_fresh.loc[df_fresh["id"] == libro["id"], cols["favorito"]] = True
-                sheet.update([df_fresh.columns.values.tolist()] + df_fresh.astype(str).values.tolist())
-                cargar_datos.clear()
+                # Actualizar la celda de favorito del perfil (y el catálogo en memoria)
+                with tramo("guardar_favorito"):
+                    actualizar_libro(get_backend(hogar), cargar_catalogo(perfil), libro["id"], {cols["favorito"]: True})
                 st.session_state.libro_actual["favorito"] = True
                 st.toast("⭐ ¡Favorito guardado!")
                 st.rerun()
         
         with col2:
             if st.button("✅ ¡Lo leímos!", key="btn_leido", use_container_width=True):
-                # Guardar estado anterior
-                df_antes = cargar_datos()
-                df_perfil_antes = obtener_df_perfil(df_antes, perfil)
+                # Estadísticas anteriores (ya calculadas para este rerun)
+                df = cargar_catalogo(perfil)
+                registro = cargar_lecturas()
+                resumen = obtener_resumen(df, perfil)
+                estadisticas_antes = obtener_estadisticas(df, perfil, resumen)
                 
-                # Actualizar
-                df_fresh, sheet = get_df()
-                idx = df_fresh["id"] == libro["id"]
-                df_fresh.loc[idx, cols["ultima"]] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                df_fresh.loc[idx, cols["veces"]] = df_fresh.loc[idx, cols["veces"]] + 1
-                sheet.update([df_fresh.columns.values.tolist()] + df_fresh.astype(str).values.tolist())
+                with tramo("guardar_lectura"):
+                    # Registrar el evento (actualiza los agregados en memoria)
+                    backend = get_backend(hogar)
+                    fecha = registrar_lectura(backend, registro, perfil, int(libro["id"]))
+                    
+                    # Actualizar las celdas de lectura del perfil y el catálogo en memoria,
+                    # contando desde lo guardado (otro dispositivo pudo sumar una lectura)
+                    veces = refrescar_estado_libro(backend, df, perfil, libro["id"])["veces"]
+                    fila = df.loc[df["id"] == libro["id"]].iloc[0]
+                    actualizar_libro(backend, df, libro["id"], {
+                        cols["ultima"]: fecha,
+                        cols["veces"]: veces + 1
+                    })
                 
-                cargar_datos.clear()
+                # Verificar logros sumando solo esta lectura a las estadísticas
+                estadisticas_despues = estadisticas_antes.con_lectura(
+                    duracion=fila["duracion_min"],
+                    primera_vez=veces == 0,
+                    fecha=fecha,
+                    racha=resumen.racha.actual(),
+                    mejor_racha=resumen.racha.mejor_racha()
+                )
+                nuevos, progreso = verificar_nuevos_logros(estadisticas_antes, estadisticas_despues)
+                st.session_state.nuevos_logros = nuevos
+                if progreso:
+                    clave = max(progreso, key=lambda k: progreso[k][0] / progreso[k][1])
+                    st.session_state.proximo_logro = (clave, *progreso[clave])
                 
-                # Verificar logros
-                df_despues = cargar_datos()
-                df_perfil_despues = obtener_df_perfil(df_despues, perfil)
-                
-                nuevo_logro = verificar_nuevo_logro(df_perfil_antes, df_perfil_despues)
-                if nuevo_logro:
-                    st.session_state.nuevo_logro = nuevo_logro
+                df_perfil_despues = obtener_df_perfil(df, perfil)
                 
                 # Verificar reto
                 reto_actual = st.session_state.get(f"reto_actual_{perfil}")
                 if reto_actual:
-                    reto_nuevo, reto_info = verificar_reto_completado(df_perfil_despues, perfil, reto_actual)
+                    reto_nuevo, reto_info = verificar_reto_completado(df_perfil_despues, perfil, reto_actual, resumen)
                     if reto_nuevo:
                         st.session_state.reto_recien_completado = reto_info
                 
@@ -345,17 +545,52 @@ def pagina_ruleta():
 
 
 # ---------------- RENDERIZAR PÁGINA ----------------
-df = cargar_datos()
+df = cargar_catalogo(perfil)
+resumen = obtener_resumen(df, perfil)
+estadisticas = obtener_estadisticas(df, perfil, resumen)
 
 if pagina == "🎡 Ruleta":
     pagina_ruleta()
+elif pagina == "🗓️ Plan":
+    with tramo("pagina_plan"):
+        pagina_plan(df, perfil, obtener_indice(df), rng=st.session_state.motor.flujo("plan"))
 elif pagina == "📖 Mi Diario":
     df_perfil = obtener_df_perfil(df, perfil)
-    pagina_historial(df_perfil, perfil)
+    with tramo("pagina_historial"):
+        pagina_historial(df_perfil, perfil, resumen, estadisticas)
 elif pagina == "👤 Mi Perfil":
     df_perfil = obtener_df_perfil(df, perfil)
-    pagina_perfil(perfil, df_perfil)
+    with tramo("pagina_perfil"):
+        pagina_perfil(perfil, df_perfil, resumen, estadisticas, icono=perfiles[perfil])
 elif pagina == "🏆 Logros":
     st.title("🏆 Mis Logros")
     df_perfil = obtener_df_perfil(df, perfil)
-    mostrar_logros(df_perfil)
+    with tramo("mostrar_logros"):
+        mostrar_logros(df_perfil, resumen, estadisticas)
+
+
+# ---------------- DEPURACIÓN ----------------
+def panel_giros():
+    """Últimos giros de la ruleta: descargarlos (ver benchmarks/bench_giros.py) o reproducirlos"""
+    motor = st.session_state.motor
+    if not motor.giros:
+        return
+    giros = list(motor.giros)
+    with st.sidebar.expander("🎲 Giros de la ruleta"):
+        st.caption(f"{len(giros)} giros · semilla {motor.semilla}")
+        st.download_button(
+            "Descargar JSON", json.dumps(giros, ensure_ascii=False, indent=2),
+            file_name="giros.json", mime="application/json"
+        )
+        if st.button("Reproducir", key="reproducir_giros"):
+            for perfil_giro in {giro["perfil"] for giro in giros}:
+                cargar_catalogo(perfil_giro)
+            df_giros = cargar_datos()
+            with tramo("reproducir_giros"):
+                libros = reproducir_giros(df_giros, giros, obtener_indice(df_giros))
+            st.caption(f"{coinciden_giros(giros, libros)} de {len(giros)} eligen el mismo libro con el catálogo actual")
+
+
+if panel_visible():
+    panel_giros()
+mostrar_panel_metricas()
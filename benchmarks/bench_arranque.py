@@ -0,0 +1,114 @@
+# benchmarks/bench_arranque.py
+"""
+Tiempo de arranque de app_libros.py:
+- informe de -X importtime de los imports de nivel superior de la app,
+  en un proceso nuevo (arranque en frío), con los módulos más lentos y
+  cuáles de los pesados (gspread, oauth2client, PIL) quedaron cargados;
+- tiempo de ejecución del script por página (reruns con AppTest y el
+  backend SQLite en un directorio temporal).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_arranque
+"""
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP = RAIZ / "app_libros.py"
+
+PESADOS = ["gspread", "oauth2client", "PIL"]
+PAGINAS = ["🎡 Ruleta", "🗓️ Plan", "📖 Mi Diario", "👤 Mi Perfil", "🏆 Logros"]
+MAS_LENTOS = 12
+REPETICIONES = 5
+
+
+def modulos_app():
+    """Módulos que app_libros.py importa a nivel superior"""
+    arbol = ast.parse(APP.read_text(encoding="utf-8"))
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos += [alias.name for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            modulos.append(nodo.module)
+    return list(dict.fromkeys(modulos))
+
+
+def informe_importtime(modulos):
+    """
+    Importa modulos en un proceso nuevo con -X importtime.
+    Retorna (entradas, cargados): entradas es una lista de
+    (propio_us, acumulado_us, profundidad, modulo) y cargados los PESADOS
+    que quedaron en sys.modules.
+    """
+    importar = f"import {', '.join(modulos)}; " if modulos else ""
+    codigo = f"import sys; {importar}print(','.join(m for m in {PESADOS!r} if m in sys.modules))"
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+
+    entradas = []
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        profundidad = (len(nombre) - len(nombre.lstrip())) // 2
+        entradas.append((int(propio), int(acumulado), profundidad, nombre.strip()))
+
+    cargados = [m for m in resultado.stdout.strip().split(",") if m]
+    return entradas, cargados
+
+
+def tiempos_paginas(repeticiones=REPETICIONES):
+    """Mejor tiempo (segundos) de un rerun del script en cada página"""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["LECTURA_BACKEND"] = "sqlite"
+    os.environ["LECTURA_SEMILLA"] = "0"
+    # Sin la línea de métricas de cada rerun en la salida
+    os.environ.setdefault("LECTURA_LOG_METRICAS", "WARNING")
+    tiempos = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        at = AppTest.from_file(str(APP), default_timeout=60)
+        at.run()
+        for pagina in PAGINAS:
+            at.sidebar.radio[1].set_value(pagina).run()
+            mejores = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                at.run()
+                mejores.append(time.perf_counter() - inicio)
+            if at.exception:
+                raise RuntimeError(f"{pagina}: {at.exception[0].value}")
+            tiempos[pagina] = min(mejores)
+        os.chdir(RAIZ)
+    return tiempos
+
+
+def main():
+    # Lo que importa el intérprete al arrancar (site, encodings...) no cuenta
+    del_interprete = {nombre for _, _, _, nombre in informe_importtime([])[0]}
+    entradas, cargados = informe_importtime(modulos_app())
+    raiz = [e for e in entradas if e[2] == 0 and e[3] not in del_interprete]
+    total = sum(acumulado for _, acumulado, _, _ in raiz)
+
+    print(f"Imports de app_libros.py en frío: {total / 1000:.0f} ms")
+    print(f"Pesados cargados: {', '.join(cargados) or 'ninguno'}")
+    print(f"\n{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo")
+    for propio, acumulado, _, nombre in sorted(raiz, reverse=True, key=lambda e: e[1])[:MAS_LENTOS]:
+        print(f"{acumulado / 1000:>15.1f} {propio / 1000:>12.1f}  {nombre}")
+
+    print(f"\n{'página':<16} {'rerun (ms)':>11}")
+    for pagina, segundos in tiempos_paginas().items():
+        print(f"{pagina:<16} {segundos * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
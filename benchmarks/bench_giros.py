@@ -0,0 +1,90 @@
+# benchmarks/bench_giros.py
+"""
+Reproduce giros de la ruleta (MotorSeleccion.giros) y mide cuánto tarda
+cada uno:
+- sin --giros: gira --cantidad veces con una semilla fija sobre un
+  catálogo sintético (ver generador.py) y reproduce la secuencia, que
+  tiene que elegir exactamente los mismos libros;
+- con --giros: reproduce los giros descargados del panel ?debug=1 de la
+  app sobre el catálogo del backend configurado (p. ej.
+  LECTURA_BACKEND=sqlite) y cuenta cuántos eligen el mismo libro.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_giros --libros 10000 --cantidad 200
+    LECTURA_BACKEND=sqlite python -m benchmarks.bench_giros --giros giros.json
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generador import estado_desde_historial, generar_catalogo, generar_historial  # noqa: E402
+from eleccion_libros import IndiceCatalogo, MotorSeleccion, coinciden_giros, reproducir_giros  # noqa: E402
+from sheets import agregar_columnas_perfil, aplicar_esquema, get_df, get_estado  # noqa: E402
+
+PERFIL = "Clara"
+EDADES = [3, 4, 5, 6, 7]
+FILTROS = [{}, {"solo_favoritos": True}, {"solo_nuevos": True}, {"max_duracion": 10}]
+
+
+def catalogo_sintetico(n, semilla=0):
+    """Catálogo tipado con las columnas de PERFIL a partir de un año de historial"""
+    df = aplicar_esquema(generar_catalogo(n, semilla))
+    eventos = generar_historial(df["id"].to_numpy(), [PERFIL], años=1, semilla=semilla)
+    return agregar_columnas_perfil(df, PERFIL, estado_desde_historial(eventos, PERFIL, semilla))
+
+
+def catalogo_backend(perfiles):
+    """Catálogo del backend configurado con las columnas de esos perfiles"""
+    df, backend = get_df()
+    for perfil in perfiles:
+        agregar_columnas_perfil(df, perfil, get_estado(backend, perfil))
+    return df
+
+
+def grabar_giros(df, indice, cantidad, semilla):
+    """Giros de un MotorSeleccion con semilla fija, variando edad y filtros"""
+    motor = MotorSeleccion(semilla, max_giros=cantidad)
+    hoy = datetime(2026, 1, 1, 20, 0)
+    for i in range(cantidad):
+        motor.girar(
+            df, PERFIL, EDADES[i % len(EDADES)], indice=indice, hoy=hoy,
+            **FILTROS[i % len(FILTROS)]
+        )
+    return list(motor.giros)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--giros", help="JSON descargado del panel de la app")
+    parser.add_argument("--libros", type=int, default=10_000)
+    parser.add_argument("--cantidad", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.giros:
+        giros = json.loads(Path(args.giros).read_text(encoding="utf-8"))
+        df = catalogo_backend(sorted({giro["perfil"] for giro in giros}))
+        indice = IndiceCatalogo(df)
+    else:
+        df = catalogo_sintetico(args.libros, args.semilla)
+        indice = IndiceCatalogo(df)
+        giros = grabar_giros(df, indice, args.cantidad, args.semilla)
+
+    inicio = time.perf_counter()
+    libros = reproducir_giros(df, giros, indice)
+    segundos = time.perf_counter() - inicio
+
+    iguales = coinciden_giros(giros, libros)
+    print(f"{len(df)} libros, {len(giros)} giros: {segundos * 1000 / max(len(giros), 1):.3f} ms por giro")
+    print(f"{iguales} de {len(giros)} eligen el mismo libro")
+    if not args.giros and iguales != len(giros):
+        sys.exit("La reproducción no eligió los mismos libros")
+
+
+if __name__ == "__main__":
+    main()
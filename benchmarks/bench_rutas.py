@@ -0,0 +1,145 @@
+# benchmarks/bench_rutas.py
+"""
+Tiempos de las rutas calientes de la app con catálogos sintéticos de
+1k a 1M libros e historiales de varios años (ver generador.py):
+- get_df: DataFrame desde los registros y cast del esquema
+- seleccionar_libro: índice del catálogo y selección
+- construir_registro: registro de lecturas desde los eventos
+- calcular_racha / obtener_logros_desbloqueados (con y sin resumen)
+- calcular_progreso_reto para cada tipo de reto (con y sin resumen)
+- lecturas_recientes del diario
+
+Escribe los resultados como JSON (stdout o --salida), para comparar
+entre versiones.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_rutas --tamaños 1000 10000 --salida resultados.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generador import (  # noqa: E402
+    df_perfil, estado_desde_historial, generar_catalogo, generar_historial
+)
+from eleccion_libros import IndiceCatalogo, seleccionar_libro  # noqa: E402
+from gamificacion import calcular_racha, obtener_logros_desbloqueados  # noqa: E402
+from historial import lecturas_recientes  # noqa: E402
+from lecturas import construir_registro  # noqa: E402
+from retos import RETOS_DISPONIBLES, calcular_progreso_reto  # noqa: E402
+from sheets import agregar_columnas_perfil, aplicar_esquema  # noqa: E402
+
+TAMAÑOS = [1_000, 10_000, 100_000, 1_000_000]
+REPETICIONES = 5
+# Con catálogos más grandes, menos repeticiones (cada una tarda segundos)
+REPETICIONES_GRANDES = 2
+GRANDE = 1_000_000
+# Armar la lista de dicts de get_all_records con 1M filas ocupa varios GB
+MAX_REGISTROS = 100_000
+
+
+def medir(funcion, repeticiones):
+    """Tiempos (segundos) de cada repetición"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def escenarios(n, perfiles, años):
+    """Genera los datos de un tamaño y retorna [(nombre, función)]"""
+    crudo = generar_catalogo(n)
+    df = aplicar_esquema(crudo.copy())
+    eventos = generar_historial(df["id"].to_numpy(), perfiles, años)
+    for perfil in perfiles:
+        agregar_columnas_perfil(df, perfil, estado_desde_historial(eventos, perfil))
+
+    perfil = perfiles[0]
+    registro = construir_registro(eventos, df)
+    resumen = registro.perfil(perfil)
+    leidos = df_perfil(df, perfil)
+    indice = IndiceCatalogo(df)
+    seleccionar_libro(df, perfil, edad_nina=5, indice=indice)  # calienta el índice del perfil
+    rng = random.Random(0)
+
+    lista = []
+    if n <= MAX_REGISTROS:
+        registros = crudo.to_dict("records")
+        lista.append(("get_df.registros", lambda: aplicar_esquema(pd.DataFrame(registros))))
+    lista += [
+        ("get_df.esquema", lambda: aplicar_esquema(crudo.copy())),
+        ("seleccionar_libro.indice", lambda: seleccionar_libro(df, perfil, edad_nina=5, indice=IndiceCatalogo(df), rng=rng)),
+        ("seleccionar_libro", lambda: seleccionar_libro(df, perfil, edad_nina=5, indice=indice, rng=rng)),
+        ("construir_registro", lambda: construir_registro(eventos, df)),
+        ("calcular_racha.df", lambda: calcular_racha(leidos)),
+        ("calcular_racha.resumen", lambda: calcular_racha(leidos, resumen)),
+        ("logros.df", lambda: obtener_logros_desbloqueados(leidos)),
+        ("logros.resumen", lambda: obtener_logros_desbloqueados(leidos, resumen)),
+        ("lecturas_recientes", lambda: lecturas_recientes(leidos)),
+    ]
+    for reto in RETOS_DISPONIBLES:
+        lista += [
+            (f"progreso_reto.{reto['id']}.df", lambda reto=reto: calcular_progreso_reto(leidos, reto)),
+            (f"progreso_reto.{reto['id']}.resumen", lambda reto=reto: calcular_progreso_reto(leidos, reto, resumen)),
+        ]
+
+    datos = {"libros": n, "eventos": len(eventos), "libros_leidos": len(leidos)}
+    return datos, lista
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamaños", type=int, nargs="+", default=TAMAÑOS)
+    parser.add_argument("--perfiles", type=int, default=3)
+    parser.add_argument("--años", type=int, default=3)
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--salida", help="archivo JSON (por defecto, stdout)")
+    args = parser.parse_args()
+
+    perfiles = [f"lectora{i}" for i in range(1, args.perfiles + 1)]
+    resultados = []
+    for n in args.tamaños:
+        datos, lista = escenarios(n, perfiles, args.años)
+        repeticiones = REPETICIONES_GRANDES if n >= GRANDE else args.repeticiones
+        for nombre, funcion in lista:
+            tiempos = medir(funcion, repeticiones)
+            resultados.append({
+                "escenario": nombre,
+                **datos,
+                "repeticiones": repeticiones,
+                "mejor_ms": round(min(tiempos) * 1000, 3),
+                "mediana_ms": round(statistics.median(tiempos) * 1000, 3),
+            })
+            print(f"{n:>9} {nombre:<40} {min(tiempos) * 1000:>10.2f} ms", file=sys.stderr)
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "perfiles": args.perfiles,
+        "años": args.años,
+        "resultados": resultados,
+    }
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        Path(args.salida).write_text(texto, encoding="utf-8")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
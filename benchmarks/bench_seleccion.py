@@ -0,0 +1,102 @@
+# benchmarks/bench_seleccion.py
+"""
+Compara seleccionar_libro con pesos calculados fila por fila
+(DataFrame.apply + random.choices, la versión anterior) contra la
+versión vectorizada, con catálogos sintéticos de 10k y 100k libros.
+La última columna reutiliza un IndiceCatalogo ya construido, como hace
+la app entre giros.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_seleccion
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generador import estado_desde_historial, generar_catalogo, generar_historial  # noqa: E402
+from eleccion_libros import DIAS_NO_REPETIR, IndiceCatalogo, seleccionar_libro  # noqa: E402
+from sheets import agregar_columnas_perfil, aplicar_esquema  # noqa: E402
+
+TAMAÑOS = [10_000, 100_000]
+REPETICIONES = 5
+
+
+def catalogo_sintetico(n, perfil="Clara", semilla=0):
+    """
+    Catálogo tipado del generador compartido (ver generador.py) con las
+    columnas del perfil a partir de un año de historial
+    """
+    df = aplicar_esquema(generar_catalogo(n, semilla))
+    eventos = generar_historial(df["id"].to_numpy(), [perfil], años=1, semilla=semilla)
+    return agregar_columnas_perfil(df, perfil, estado_desde_historial(eventos, perfil, semilla))
+
+
+def seleccionar_libro_apply(df, perfil, edad_nina, solo_favoritos=False, solo_nuevos=False):
+    """Versión anterior de seleccionar_libro: una llamada de Python por fila"""
+    hoy = datetime.now()
+    perfil_lower = perfil.lower()
+    col_favorito = f"favorito_{perfil_lower}"
+    col_veces = f"veces_{perfil_lower}"
+    col_ultima = f"ultima_{perfil_lower}"
+
+    candidatos = df[
+        (df["activa"] == True) &
+        (df["edad_min"] <= edad_nina) &
+        (df["edad_max"] >= edad_nina)
+    ].copy()
+    candidatos = candidatos[
+        (candidatos[col_ultima].isna()) |
+        (candidatos[col_ultima] < hoy - timedelta(days=DIAS_NO_REPETIR))
+    ]
+
+    def peso(row):
+        w = 1.0
+        if not solo_favoritos and row[col_favorito]:
+            w *= 1.5
+        if not solo_nuevos and row[col_veces] == 0:
+            w *= 1.4
+        if row["interactivo"]:
+            w *= 1.2
+        if row[col_veces] > 0 and row[col_veces] < 3:
+            w *= 1.1
+        return w
+
+    pesos = candidatos.apply(peso, axis=1)
+    elegido = random.choices(list(candidatos.index), weights=pesos, k=1)[0]
+    return candidatos.loc[elegido]
+
+
+def medir(funcion, repeticiones=REPETICIONES):
+    """Mejor tiempo (segundos) de varias repeticiones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    random.seed(0)
+    print(f"{'libros':>8} {'apply (ms)':>12} {'vectorizado (ms)':>18} {'speedup':>9} {'con índice (ms)':>17}")
+    for n in TAMAÑOS:
+        df = catalogo_sintetico(n)
+        indice = IndiceCatalogo(df)
+        seleccionar_libro(df, "Clara", edad_nina=5, indice=indice)  # calienta el índice
+
+        t_apply = medir(lambda: seleccionar_libro_apply(df, "Clara", edad_nina=5))
+        t_vector = medir(lambda: seleccionar_libro(df, "Clara", edad_nina=5))
+        t_indice = medir(lambda: seleccionar_libro(df, "Clara", edad_nina=5, indice=indice))
+
+        print(
+            f"{n:>8} {t_apply * 1000:>12.1f} {t_vector * 1000:>18.1f} "
+            f"{t_apply / t_vector:>8.1f}x {t_indice * 1000:>17.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/generador.py
+"""
+Datos sintéticos para los benchmarks:
+- catálogos con la forma de catalogo_libros.csv (filas del CSV remuestreadas,
+  así edades, duraciones, tipos y ubicaciones mantienen sus proporciones);
+- historiales de lectura de varios años para N perfiles, como los eventos
+  que devuelve leer_lecturas, y el estado de cada perfil que se deriva de
+  ellos (como get_estado).
+"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from almacenamiento import CSV_SEMILLA  # noqa: E402
+from lecturas import FORMATO_FECHA  # noqa: E402
+
+COLUMNAS_ENTERAS = ["edad_min", "edad_max", "duracion_min", "veces_leido"]
+PROPORCION_INACTIVOS = 0.05
+PROPORCION_FAVORITOS = 0.1
+
+
+# ---------------- CATÁLOGO ----------------
+def generar_catalogo(n, semilla=0):
+    """
+    Catálogo de n libros tal como llega de get_all_records, antes de
+    aplicar el esquema: números como enteros y el resto como texto
+    ("TRUE"/"FALSE", celdas vacías como "").
+    """
+    rng = np.random.default_rng(semilla)
+    base = pd.read_csv(CSV_SEMILLA, dtype=str, keep_default_na=False)
+    filas = rng.integers(0, len(base), n)
+
+    df = pd.DataFrame({col: base[col].to_numpy()[filas] for col in base.columns})
+    df["id"] = np.arange(1, n + 1)
+    df["titulo"] = df["titulo"] + " #" + df["id"].astype(str)
+    for col in COLUMNAS_ENTERAS:
+        df[col] = df[col].astype(int)
+    df["activa"] = np.where(rng.random(n) < PROPORCION_INACTIVOS, "FALSE", df["activa"])
+    return df
+
+
+# ---------------- HISTORIAL ----------------
+def generar_historial(ids, perfiles, años=3, semilla=0, hoy=None):
+    """
+    Eventos de lectura {perfil, libro_id, fecha} de los últimos años:
+    cada perfil lee el 80% de los días, una o dos veces, casi siempre de
+    noche, y relee a menudo un grupo de libros preferidos.
+    """
+    rng = np.random.default_rng(semilla)
+    hoy = hoy or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    ids = np.asarray(ids)
+    dias = años * 365
+
+    eventos = []
+    for perfil in perfiles:
+        preferidos = rng.choice(ids, size=min(len(ids), 300), replace=False)
+        con_lectura = np.flatnonzero(rng.random(dias) < 0.8)
+        por_dia = rng.choice([1, 1, 1, 2], len(con_lectura))
+        dia = np.repeat(con_lectura, por_dia)
+        k = len(dia)
+
+        libros = np.where(rng.random(k) < 0.7, rng.choice(preferidos, k), rng.choice(ids, k))
+        horas = np.where(rng.random(k) < 0.85, rng.integers(19, 22, k), rng.integers(7, 9, k))
+        minutos = rng.integers(0, 60, k)
+
+        for d, libro_id, hora, minuto in zip(dia, libros, horas, minutos):
+            fecha = hoy - timedelta(days=int(dias - 1 - d)) + timedelta(hours=int(hora), minutes=int(minuto))
+            eventos.append({"perfil": perfil, "libro_id": int(libro_id), "fecha": fecha.strftime(FORMATO_FECHA)})
+
+    return eventos
+
+
+def estado_desde_historial(eventos, perfil, semilla=0):
+    """Estado de lectura del perfil (como get_estado) a partir de sus eventos"""
+    rng = np.random.default_rng(semilla)
+    lecturas = pd.DataFrame([e for e in eventos if e["perfil"] == perfil], columns=["perfil", "libro_id", "fecha"])
+    lecturas["fecha"] = pd.to_datetime(lecturas["fecha"])
+
+    estado = (
+        lecturas.groupby("libro_id")["fecha"]
+        .agg(veces="size", ultima="max")
+        .reset_index()
+    )
+    estado["favorito"] = rng.random(len(estado)) < PROPORCION_FAVORITOS
+    return estado[["libro_id", "favorito", "veces", "ultima"]]
+
+
+def df_perfil(df, perfil):
+    """Libros leídos por el perfil con columnas genéricas (como obtener_df_perfil de la app)"""
+    perfil_lower = perfil.lower()
+    resultado = df.copy()
+    resultado["favorito"] = resultado[f"favorito_{perfil_lower}"]
+    resultado["veces_leido"] = resultado[f"veces_{perfil_lower}"]
+    resultado["ultima_lectura"] = resultado[f"ultima_{perfil_lower}"]
+    return resultado[resultado["veces_leido"] > 0]
@@ -0,0 +1,393 @@
+# cola_escritura.py
+import atexit
+import contextlib
+import logging
+import threading
+import time
+
+import streamlit as st
+
+from almacenamiento import ESTADO_INICIAL, BackendDatos, RevisionPendiente, crear_backend
+
+log = logging.getLogger(__name__)
+
+
+# ---------------- COLA ----------------
+# Segundos sin poder escribir tras los que la app avisa (ver atascada)
+ESPERA_AVISO = 60
+# Errores de un valor mal formado (p. ej. una columna que no existe):
+# reintentarlos no sirve
+ERRORES_DE_DATOS = (KeyError, ValueError, TypeError)
+# Segundos que espera escribir_tabla a que se vacíe la cola
+ESPERA_VACIAR = 30
+
+
+class ColaEscritura:
+    """
+    Cola write-behind para las escrituras al backend.
+
+    Las celdas se agrupan por (fila, columna) y el estado de las lectoras
+    por (perfil, libro, campo): si un valor cambia varias veces antes de
+    escribirse, solo se envía el último. Un hilo en segundo plano vacía la
+    cola en lotes (una escritura de celdas, una de estado por perfil y una
+    de lecturas por lote) con un mismo backend. Si el backend falla, lo que
+    no se escribió vuelve a la cola y se reintenta con espera creciente
+    (hasta espera_maxima) mientras haga falta: nunca se descarta una
+    escritura válida; atascada avisa si lleva mucho sin poder escribir.
+    Si los datos se escribieron y solo falló subir la revisión, no se
+    reenvían (las lecturas se duplicarían): se reintenta solo la revisión.
+
+    Mientras un lote se escribe queda "en vuelo": las lecturas lo siguen
+    viendo hasta que el backend confirma la escritura.
+    """
+
+    def __init__(self, hogar=None, intervalo=0.5, espera_maxima=30):
+        self.hogar = hogar
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+
+        self._celdas = {}
+        self._estado = {}
+        self._lecturas = []
+        self._en_vuelo = {"celdas": {}, "estado": {}, "lecturas": []}
+        self._propias = set()
+        self._revision_pendiente = False
+        self._escribiendo = False
+        self._fallando_desde = None
+        self._ultimo_error = None
+        self._cond = threading.Condition()
+        # Escribir lecturas y sacarlas de lo que está en vuelo es un solo paso
+        # para quien lee el registro: ni se pierden ni se duplican
+        self._lock_lecturas = threading.Lock()
+
+        self._hilo = threading.Thread(target=self._trabajar, name="cola-escritura", daemon=True)
+        self._hilo.start()
+        atexit.register(self.vaciar, 10)
+
+    # --- Encolar ---
+    def encolar_celdas(self, cambios):
+        with self._cond:
+            for fila, columna, valor in cambios:
+                self._celdas[(fila, columna)] = valor
+            self._cond.notify_all()
+
+    def encolar_estado(self, perfil, cambios):
+        with self._cond:
+            for libro_id, campo, valor in cambios:
+                self._estado[(perfil.lower(), str(libro_id), campo)] = valor
+            self._cond.notify_all()
+
+    def encolar_lectura(self, perfil, libro_id, fecha):
+        with self._cond:
+            self._lecturas.append((perfil, libro_id, fecha))
+            self._cond.notify_all()
+
+    # --- Consultar lo pendiente ---
+    def pendientes(self):
+        """Cantidad de celdas, valores de estado y lecturas aún no escritos (incluido lo en vuelo)"""
+        with self._cond:
+            en_vuelo = sum(len(entradas) for entradas in self._en_vuelo.values())
+            return len(self._celdas) + len(self._estado) + len(self._lecturas) + en_vuelo
+
+    def valor_pendiente(self, fila, columna, por_defecto=None):
+        with self._cond:
+            if (fila, columna) in self._celdas:
+                return self._celdas[(fila, columna)]
+            return self._en_vuelo["celdas"].get((fila, columna), por_defecto)
+
+    def aplicar_pendientes(self, registros):
+        """Aplica las celdas pendientes (y en vuelo) sobre los registros leídos del backend"""
+        with self._cond:
+            celdas = {**self._en_vuelo["celdas"], **self._celdas}
+        for (fila, columna), valor in celdas.items():
+            if 0 <= fila - 2 < len(registros):
+                registros[fila - 2][columna] = valor
+        return registros
+
+    def aplicar_estado_pendiente(self, perfil, filas):
+        """Aplica el estado pendiente (y en vuelo) de una lectora sobre sus filas leídas del backend"""
+        perfil = perfil.lower()
+        with self._cond:
+            pendiente = {
+                (libro_id, campo): valor
+                for (p, libro_id, campo), valor in {**self._en_vuelo["estado"], **self._estado}.items()
+                if p == perfil
+            }
+        if not pendiente:
+            return filas
+
+        por_libro = {str(fila["libro_id"]): fila for fila in filas}
+        for (libro_id, campo), valor in pendiente.items():
+            if libro_id not in por_libro:
+                por_libro[libro_id] = dict(ESTADO_INICIAL, libro_id=libro_id)
+                filas.append(por_libro[libro_id])
+            por_libro[libro_id][campo] = valor
+        return filas
+
+    def solo_propias(self, desde, hasta):
+        """Si todas las revisiones entre desde (excluida) y hasta las escribió esta cola"""
+        if hasta < desde:
+            return False
+        with self._cond:
+            propias = sum(1 for revision in self._propias if desde < revision <= hasta)
+        return propias == hasta - desde
+
+    def registrar_propias(self, revisiones):
+        """Anota revisiones escritas por esta cola (o por escrituras directas del hogar)"""
+        with self._cond:
+            self._propias.update(revisiones)
+            if len(self._propias) > 1000:
+                self._propias = set(sorted(self._propias)[-500:])
+
+    def lecturas_pendientes(self):
+        with self._cond:
+            return [
+                {"perfil": perfil, "libro_id": libro_id, "fecha": fecha}
+                for perfil, libro_id, fecha in self._en_vuelo["lecturas"] + self._lecturas
+            ]
+
+    def leer_lecturas(self, leer):
+        """Registro del backend (leer()) con las lecturas pendientes al final"""
+        with self._lock_lecturas:
+            return leer() + self.lecturas_pendientes()
+
+    def atascada(self, espera=ESPERA_AVISO):
+        """
+        Error del backend si la cola lleva más de espera segundos sin poder
+        escribir, o None. Lo pendiente sigue en la cola y se reintenta.
+        """
+        with self._cond:
+            if self._fallando_desde is None or time.monotonic() - self._fallando_desde < espera:
+                return None
+            return self._ultimo_error
+
+    def _hay_trabajo(self):
+        return self._celdas or self._estado or self._lecturas or self._revision_pendiente
+
+    def vaciar(self, timeout=None):
+        """Espera a que se escriba todo lo pendiente; retorna False si se agotó el tiempo"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._hay_trabajo() and not self._escribiendo, timeout)
+
+    # --- Hilo de escritura ---
+    def _tomar_lote(self):
+        """
+        Espera cambios y los pasa a en vuelo. Retorna las partes del lote:
+        lista de (tipo, perfil, entradas), con las entradas como en la cola.
+        """
+        with self._cond:
+            self._cond.wait_for(self._hay_trabajo)
+
+        # Pequeña espera para juntar cambios que llegan seguidos
+        time.sleep(self.intervalo)
+
+        with self._cond:
+            celdas, self._celdas = self._celdas, {}
+            estado, self._estado = self._estado, {}
+            lecturas, self._lecturas = self._lecturas, []
+            self._en_vuelo = {"celdas": dict(celdas), "estado": dict(estado), "lecturas": list(lecturas)}
+            self._escribiendo = True
+
+        partes = []
+        if celdas:
+            partes.append(("celdas", None, list(celdas.items())))
+        for perfil in dict.fromkeys(p for p, _, _ in estado):
+            partes.append(("estado", perfil, [(clave, valor) for clave, valor in estado.items() if clave[0] == perfil]))
+        if lecturas:
+            partes.append(("lecturas", None, lecturas))
+        return partes
+
+    def _quitar_en_vuelo(self, tipo, entradas):
+        with self._cond:
+            if tipo == "lecturas":
+                for lectura in entradas:
+                    if lectura in self._en_vuelo["lecturas"]:
+                        self._en_vuelo["lecturas"].remove(lectura)
+            else:
+                for clave, _ in entradas:
+                    self._en_vuelo[tipo].pop(clave, None)
+
+    def _enviar(self, backend, tipo, perfil, entradas):
+        """
+        Escribe entradas de un tipo en el backend y las saca de en vuelo,
+        también si solo falló subir la revisión (RevisionPendiente: queda
+        anotada para reintentarla y el error sigue hacia _trabajar).
+        """
+        # Para quien lee el registro, escribir lecturas y sacarlas de en vuelo es un paso
+        with self._lock_lecturas if tipo == "lecturas" else contextlib.nullcontext():
+            try:
+                if tipo == "celdas":
+                    backend.actualizar_celdas([(fila, columna, valor) for (fila, columna), valor in entradas])
+                elif tipo == "estado":
+                    backend.guardar_estado(perfil, [(libro_id, campo, valor) for (_, libro_id, campo), valor in entradas])
+                else:
+                    backend.agregar_lecturas(entradas)
+            except RevisionPendiente:
+                self._quitar_en_vuelo(tipo, entradas)
+                with self._cond:
+                    self._revision_pendiente = True
+                raise
+            self._quitar_en_vuelo(tipo, entradas)
+
+    def _escribir_parte(self, backend, tipo, perfil, entradas):
+        """
+        Escribe una parte del lote. Si un valor es inválido, escribe las
+        entradas de a una y descarta (con un error en el log) las que fallan,
+        para que no frenen a las demás. entradas se vacía a medida que se
+        escribe: ante un error transitorio queda solo lo que falta.
+        """
+        try:
+            self._enviar(backend, tipo, perfil, entradas)
+            entradas.clear()
+            return
+        except RevisionPendiente:
+            entradas.clear()
+            raise
+        except ERRORES_DE_DATOS as e:
+            if len(entradas) == 1:
+                log.error("Se descarta una escritura inválida (%s): %s: %s", tipo, entradas[0], e)
+                self._quitar_en_vuelo(tipo, entradas)
+                entradas.clear()
+                return
+
+        while entradas:
+            try:
+                self._enviar(backend, tipo, perfil, entradas[:1])
+            except RevisionPendiente:
+                entradas.pop(0)
+                raise
+            except ERRORES_DE_DATOS as e:
+                log.error("Se descarta una escritura inválida (%s): %s: %s", tipo, entradas[0], e)
+                self._quitar_en_vuelo(tipo, entradas[:1])
+            entradas.pop(0)
+
+    def _devolver_lote(self, partes):
+        with self._cond:
+            # No pisar valores más nuevos encolados mientras tanto
+            lecturas = []
+            for tipo, _, entradas in partes:
+                if tipo == "celdas":
+                    for clave, valor in entradas:
+                        self._celdas.setdefault(clave, valor)
+                elif tipo == "estado":
+                    for clave, valor in entradas:
+                        self._estado.setdefault(clave, valor)
+                else:
+                    lecturas = entradas
+            self._lecturas = lecturas + self._lecturas
+            self._en_vuelo = {"celdas": {}, "estado": {}, "lecturas": []}
+
+    def _trabajar(self):
+        backend = None
+        intentos = 0
+        while True:
+            partes = self._tomar_lote()
+            try:
+                if backend is None:
+                    backend = crear_backend(self.hogar)
+                if self._revision_pendiente:
+                    backend.subir_revision()
+                    with self._cond:
+                        self._revision_pendiente = False
+                while partes:
+                    self._escribir_parte(backend, *partes[0])
+                    partes.pop(0)
+                intentos = 0
+                with self._cond:
+                    self._fallando_desde = None
+                    self._ultimo_error = None
+            except Exception as e:
+                intentos += 1
+                log.warning("Error escribiendo al backend (intento %s): %s", intentos, e)
+                self._devolver_lote(partes)
+                with self._cond:
+                    if self._fallando_desde is None:
+                        self._fallando_desde = time.monotonic()
+                    self._ultimo_error = e
+                # Una conexión que falló no se reutiliza
+                backend_fallido, backend = backend, None
+                if backend_fallido is not None:
+                    self.registrar_propias(backend_fallido.revisiones_escritas)
+            finally:
+                if backend is not None:
+                    self.registrar_propias(backend.revisiones_escritas)
+                    backend.revisiones_escritas.clear()
+                with self._cond:
+                    self._escribiendo = False
+                    self._cond.notify_all()
+
+            if intentos:
+                time.sleep(min(self.intervalo * 2 ** intentos, self.espera_maxima))
+
+
+@st.cache_resource
+def obtener_cola(hogar=None):
+    """Cola única por proceso para cada hogar"""
+    return ColaEscritura(hogar)
+
+
+# ---------------- BACKEND DIFERIDO ----------------
+class BackendDiferido(BackendDatos):
+    """
+    Envuelve un backend: las escrituras se encolan y retornan al instante,
+    y las lecturas devuelven los datos del backend con lo pendiente aplicado.
+    """
+
+    def __init__(self, backend, cola):
+        self.backend = backend
+        self.cola = cola
+
+    def leer_revision(self):
+        return self.backend.leer_revision()
+
+    def solo_escrituras_propias(self, desde, hasta):
+        return self.cola.solo_propias(desde, hasta)
+
+    def leer_formato(self):
+        return self.backend.leer_formato()
+
+    def escribir_formato(self, marca):
+        self.backend.escribir_formato(marca)
+
+    def leer_registros(self):
+        return self.cola.aplicar_pendientes(self.backend.leer_registros())
+
+    def leer_encabezados(self):
+        return self.backend.leer_encabezados()
+
+    def leer_celda(self, fila, columna):
+        pendiente = self.cola.valor_pendiente(fila, columna)
+        if pendiente is not None:
+            return pendiente
+        return self.backend.leer_celda(fila, columna)
+
+    def escribir_celda(self, fila, columna, valor):
+        self.cola.encolar_celdas([(fila, columna, valor)])
+
+    def actualizar_celdas(self, cambios):
+        self.cola.encolar_celdas(cambios)
+
+    def escribir_tabla(self, filas):
+        # Reemplazar la tabla invalida lo pendiente: primero se escribe todo
+        if not self.cola.vaciar(ESPERA_VACIAR):
+            raise TimeoutError("La cola de escritura no terminó de vaciarse; la tabla no se reemplazó")
+        self.backend.escribir_tabla(filas)
+
+    def leer_lecturas(self):
+        return self.cola.leer_lecturas(self.backend.leer_lecturas)
+
+    def agregar_lectura(self, perfil, libro_id, fecha):
+        self.cola.encolar_lectura(perfil, libro_id, fecha)
+
+    def leer_perfiles(self):
+        return self.backend.leer_perfiles()
+
+    def agregar_perfil(self, nombre, icono):
+        self.backend.agregar_perfil(nombre, icono)
+        self.cola.registrar_propias(self.backend.revisiones_escritas)
+
+    def leer_estado(self, perfil):
+        return self.cola.aplicar_estado_pendiente(perfil, self.backend.leer_estado(perfil))
+
+    def guardar_estado(self, perfil, cambios):
+        self.cola.encolar_estado(perfil, cambios)
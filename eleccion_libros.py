@@ -1,8 +1,135 @@
 # eleccion_libros.py
 import random
+from collections import deque
 from datetime import datetime, timedelta
 
+import numpy as np
+
 DIAS_NO_REPETIR = 5
+# Giros que guarda MotorSeleccion (los más recientes)
+MAX_GIROS = 200
+
+
+# ---------------- ÍNDICE DE CANDIDATOS ----------------
+class IndiceCatalogo:
+    """
+    Índice de los filtros de la ruleta, construido una vez por versión del
+    catálogo. Cada filtro (edad, duración, favoritos/nuevos por perfil) es
+    un array booleano sobre las filas del catálogo que se calcula la primera
+    vez que se pide y se reutiliza después: un giro cuesta unas pocas
+    intersecciones (&) en lugar de varios filtrados del DataFrame completo.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        # Sin marca (<NA>): un libro no está activo ni es interactivo
+        self.activa = df["activa"].fillna(False).to_numpy(dtype=bool)
+        self.interactivo = df["interactivo"].fillna(False).to_numpy(dtype=bool)
+        self.titulos = df["titulo"].to_numpy()
+        self.portadas = df["portada_url"].to_numpy() if "portada_url" in df.columns else None
+        self._edad_min = df["edad_min"].to_numpy()
+        self._edad_max = df["edad_max"].to_numpy()
+        self._duracion = df["duracion_min"].to_numpy()
+
+        self._por_edad = {}
+        self._por_duracion = {}
+        self._por_perfil = {}
+
+    def bytes_estimados(self):
+        """Memoria de los arrays del índice (sin contar el catálogo)"""
+        arrays = [self.activa, self.interactivo, self.titulos, self._edad_min, self._edad_max, self._duracion]
+        arrays += list(self._por_edad.values()) + list(self._por_duracion.values())
+        for datos in self._por_perfil.values():
+            arrays += list(datos.values())
+        if self.portadas is not None:
+            arrays.append(self.portadas)
+        return sum(a.nbytes for a in arrays)
+
+    def por_edad(self, edad):
+        """Libros activos apropiados para la edad"""
+        if edad not in self._por_edad:
+            self._por_edad[edad] = self.activa & (self._edad_min <= edad) & (self._edad_max >= edad)
+        return self._por_edad[edad]
+
+    def por_duracion(self, max_duracion):
+        """Libros de hasta max_duracion minutos"""
+        if max_duracion not in self._por_duracion:
+            self._por_duracion[max_duracion] = self._duracion <= max_duracion
+        return self._por_duracion[max_duracion]
+
+    def perfil(self, perfil):
+        """Arrays del perfil: favorito, veces, ultima y nuevos (veces == 0)"""
+        if perfil not in self._por_perfil:
+            perfil_lower = perfil.lower()
+            veces = self.df[f"veces_{perfil_lower}"].to_numpy()
+            self._por_perfil[perfil] = {
+                "favorito": self.df[f"favorito_{perfil_lower}"].to_numpy(dtype=bool),
+                "veces": veces,
+                "ultima": self.df[f"ultima_{perfil_lower}"].to_numpy(dtype="datetime64[ns]"),
+                "nuevos": veces == 0,
+            }
+        return self._por_perfil[perfil]
+
+    def candidatos(
+        self,
+        perfil,
+        edad_nina,
+        max_duracion=None,
+        permitir_interactivo=True,
+        solo_favoritos=False,
+        solo_nuevos=False,
+        hoy=None
+    ):
+        """Retorna la máscara booleana de libros elegibles"""
+        mascara = self.por_edad(edad_nina)
+
+        # Filtro por duración
+        if max_duracion:
+            mascara = mascara & self.por_duracion(max_duracion)
+
+        # Filtro por interactivo
+        if not permitir_interactivo:
+            mascara = mascara & ~self.interactivo
+
+        datos = self.perfil(perfil)
+
+        # Filtro: solo favoritos DEL PERFIL
+        if solo_favoritos:
+            mascara = mascara & datos["favorito"]
+
+        # Filtro: solo libros nuevos (nunca leídos POR ESTE PERFIL)
+        elif solo_nuevos:
+            mascara = mascara & datos["nuevos"]
+
+        # Filtro normal: no repetir en X días PARA ESTE PERFIL
+        else:
+            hoy = hoy or datetime.now()
+            limite = np.datetime64(hoy - timedelta(days=DIAS_NO_REPETIR), "ns")
+            ultima = datos["ultima"]
+            mascara = mascara & (np.isnat(ultima) | (ultima < limite))
+
+        return mascara
+
+    def titulos_de(self, mascara):
+        """Títulos de los libros de la máscara"""
+        return self.titulos[mascara].tolist()
+
+    def portadas_probables(self, perfil, mascara, n=30, solo_favoritos=False, solo_nuevos=False):
+        """URLs de portada de los n candidatos con más peso (los ganadores más probables)"""
+        if self.portadas is None:
+            return []
+
+        posiciones = np.flatnonzero(mascara)
+        datos = self.perfil(perfil)
+        pesos = calcular_pesos(
+            datos["favorito"][posiciones],
+            datos["veces"][posiciones],
+            self.interactivo[posiciones],
+            solo_favoritos=solo_favoritos,
+            solo_nuevos=solo_nuevos
+        )
+        mejores = posiciones[np.argsort(-pesos, kind="stable")[:n]]
+        return self.portadas[mejores].tolist()
 
 
 def seleccionar_libro(
@@ -12,83 +139,233 @@ def seleccionar_libro(
     max_duracion=None,
     permitir_interactivo=True,
     solo_favoritos=False,
-    solo_nuevos=False
+    solo_nuevos=False,
+    indice=None,
+    rng=None,
+    hoy=None
 ):
     """
     Selecciona un libro basado en criterios y perfil.
+    Si se pasa el índice del catálogo, se reutilizan sus filtros precalculados.
+    rng (random.Random) y hoy permiten repetir exactamente la misma selección.
     """
-    hoy = datetime.now()
-    
-    # Columnas específicas del perfil
-    perfil_lower = perfil.lower()
-    col_favorito = f"favorito_{perfil_lower}"
-    col_veces = f"veces_{perfil_lower}"
-    col_ultima = f"ultima_{perfil_lower}"
-
-    # Filtro base: activos y edad apropiada
-    candidatos = df[
-        (df["activa"] == True) &
-        (df["edad_min"] <= edad_nina) &
-        (df["edad_max"] >= edad_nina)
-    ].copy()
-
-    # Filtro por duración
-    if max_duracion:
-        candidatos = candidatos[candidatos["duracion_min"] <= max_duracion]
-
-    # Filtro por interactivo
-    if not permitir_interactivo:
-        candidatos = candidatos[candidatos["interactivo"] == False]
-    
-    # Filtro: solo favoritos DEL PERFIL
-    if solo_favoritos:
-        candidatos = candidatos[candidatos[col_favorito] == True]
-    
-    # Filtro: solo libros nuevos (nunca leídos POR ESTE PERFIL)
-    elif solo_nuevos:
-        candidatos = candidatos[candidatos[col_veces] == 0]
-    
-    # Filtro normal: no repetir en X días PARA ESTE PERFIL
-    else:
-        candidatos = candidatos[
-            (candidatos[col_ultima].isna()) |
-            (candidatos[col_ultima] < hoy - timedelta(days=DIAS_NO_REPETIR))
-        ]
-
-    if candidatos.empty:
+    if indice is None:
+        indice = IndiceCatalogo(df)
+
+    mascara = indice.candidatos(
+        perfil,
+        edad_nina,
+        max_duracion=max_duracion,
+        permitir_interactivo=permitir_interactivo,
+        solo_favoritos=solo_favoritos,
+        solo_nuevos=solo_nuevos,
+        hoy=hoy
+    )
+    posiciones = np.flatnonzero(mascara)
+
+    if len(posiciones) == 0:
         return None
 
-    def peso(row):
-        """Calcula el peso/probabilidad de selección"""
-        w = 1.0
-        
-        # Favoritos tienen más probabilidad
-        if not solo_favoritos and row[col_favorito]:
-            w *= 1.5
-        
-        # Libros nuevos tienen más probabilidad
-        if not solo_nuevos and row[col_veces] == 0:
-            w *= 1.4
-        
-        # Libros interactivos ligeramente más probables
-        if row["interactivo"]:
-            w *= 1.2
-        
-        # Libros poco leídos tienen más probabilidad
-        if row[col_veces] > 0 and row[col_veces] < 3:
-            w *= 1.1
-        
-        return w
-
-    pesos = candidatos.apply(peso, axis=1)
-
-    elegido = random.choices(
-        list(candidatos.index),
-        weights=pesos,
-        k=1
-    )[0]
-
-    return candidatos.loc[elegido]
+    datos = indice.perfil(perfil)
+    pesos = calcular_pesos(
+        datos["favorito"][posiciones],
+        datos["veces"][posiciones],
+        indice.interactivo[posiciones],
+        solo_favoritos=solo_favoritos,
+        solo_nuevos=solo_nuevos
+    )
+
+    return indice.df.iloc[posiciones[elegir_indice(pesos, rng)]]
+
+
+def seleccionar_libros(
+    df,
+    perfil,
+    edad_nina,
+    k=7,
+    max_duracion=None,
+    permitir_interactivo=True,
+    solo_favoritos=False,
+    solo_nuevos=False,
+    indice=None,
+    hoy=None,
+    rng=None
+):
+    """
+    Planifica k días de lectura: k libros distintos en un solo sorteo
+    ponderado sin reemplazo (mismos pesos que seleccionar_libro).
+
+    En el modo normal un libro leído hace poco solo puede tocar en los
+    días del plan en que ya pasaron DIAS_NO_REPETIR desde su última lectura.
+    Retorna un DataFrame con los libros y la columna "dia" (puede traer menos
+    de k filas si no hay suficientes candidatos). rng (random.Random) hace
+    el sorteo reproducible.
+    """
+    if indice is None:
+        indice = IndiceCatalogo(df)
+    hoy = hoy or datetime.now()
+    dias = [hoy + timedelta(days=d) for d in range(k)]
+
+    # Candidatos elegibles al menos el último día del plan
+    mascara = indice.candidatos(
+        perfil,
+        edad_nina,
+        max_duracion=max_duracion,
+        permitir_interactivo=permitir_interactivo,
+        solo_favoritos=solo_favoritos,
+        solo_nuevos=solo_nuevos,
+        hoy=dias[-1]
+    )
+    posiciones = np.flatnonzero(mascara)
+
+    if len(posiciones) == 0:
+        return indice.df.iloc[[]].assign(dia=[])
+
+    datos = indice.perfil(perfil)
+    pesos = calcular_pesos(
+        datos["favorito"][posiciones],
+        datos["veces"][posiciones],
+        indice.interactivo[posiciones],
+        solo_favoritos=solo_favoritos,
+        solo_nuevos=solo_nuevos
+    )
+
+    # Sorteo sin reemplazo (Efraimidis-Spirakis): ordenar por -log(u) / peso
+    generador = np.random.default_rng((rng or random).getrandbits(64))
+    claves = -np.log(1.0 - generador.random(len(posiciones))) / pesos
+    orden = posiciones[np.argsort(claves)]
+
+    # Asignar a cada día el primer libro del sorteo que se pueda leer ese día
+    usados = np.zeros(len(orden), dtype=bool)
+    ultima = datos["ultima"][orden]
+    elegidos, dias_plan = [], []
+    for dia in dias:
+        if solo_favoritos or solo_nuevos:
+            elegibles = ~usados
+        else:
+            limite = np.datetime64(dia - timedelta(days=DIAS_NO_REPETIR), "ns")
+            elegibles = ~usados & (np.isnat(ultima) | (ultima < limite))
+        if not elegibles.any():
+            continue
+        j = int(np.argmax(elegibles))
+        usados[j] = True
+        elegidos.append(orden[j])
+        dias_plan.append(dia.date())
+
+    return indice.df.iloc[elegidos].assign(dia=dias_plan)
+
+
+def calcular_pesos(favorito, veces, interactivo, solo_favoritos=False, solo_nuevos=False):
+    """
+    Calcula el peso/probabilidad de selección de cada candidato
+    con operaciones sobre columnas completas (arrays numpy).
+    """
+    pesos = np.ones(len(veces))
+
+    # Favoritos tienen más probabilidad
+    if not solo_favoritos:
+        pesos[favorito] *= 1.5
+
+    # Libros nuevos tienen más probabilidad
+    if not solo_nuevos:
+        pesos[veces == 0] *= 1.4
+
+    # Libros interactivos ligeramente más probables
+    pesos[interactivo] *= 1.2
+
+    # Libros poco leídos tienen más probabilidad
+    pesos[(veces > 0) & (veces < 3)] *= 1.1
+
+    return pesos
+
+
+def elegir_indice(pesos, rng=None):
+    """Elige una posición al azar proporcional a los pesos (como random.choices)"""
+    acumulados = np.cumsum(pesos)
+    posicion = np.searchsorted(acumulados, (rng or random).random() * acumulados[-1], side="right")
+    return int(min(posicion, len(pesos) - 1))
+
+
+# ---------------- MOTOR REPRODUCIBLE ----------------
+class MotorSeleccion:
+    """
+    Selección reproducible para pruebas de rendimiento y repeticiones.
+    Cada giro usa su propia semilla, sacada del RNG del motor, y queda
+    registrado con sus parámetros: con la misma semilla inicial y el mismo
+    catálogo se obtiene la misma secuencia de libros. Guarda solo los
+    últimos max_giros (vive en session_state).
+    El RNG de los giros es solo suyo; el resto de la app (animación, reto,
+    plan) usa los flujos aparte de flujo().
+    """
+
+    def __init__(self, semilla=None, max_giros=MAX_GIROS):
+        self.semilla = semilla
+        self._rng = random.Random(semilla)
+        self._flujos = {}
+        self.giros = deque(maxlen=max_giros)
+
+    def flujo(self, nombre):
+        """
+        RNG para otro uso, derivado de la semilla y del nombre: con la
+        misma semilla es siempre la misma secuencia, y usarlo no cambia
+        la de los giros.
+        """
+        if nombre not in self._flujos:
+            semilla = None if self.semilla is None else f"{self.semilla}/{nombre}"
+            self._flujos[nombre] = random.Random(semilla)
+        return self._flujos[nombre]
+
+    def girar(self, df, perfil, edad_nina, indice=None, hoy=None, **filtros):
+        """Como seleccionar_libro, registrando el giro"""
+        semilla_giro = self._rng.getrandbits(64)
+        hoy = hoy or datetime.now()
+
+        libro = seleccionar_libro(
+            df, perfil, edad_nina,
+            indice=indice,
+            rng=random.Random(semilla_giro),
+            hoy=hoy,
+            **filtros
+        )
+
+        self.giros.append({
+            "semilla": semilla_giro,
+            "hoy": hoy.isoformat(),
+            "perfil": perfil,
+            "edad_nina": edad_nina,
+            "filtros": filtros,
+            "libro_id": None if libro is None else int(libro["id"]),
+        })
+        return libro
+
+
+def reproducir_giros(df, giros, indice=None):
+    """
+    Vuelve a ejecutar una secuencia grabada de giros (MotorSeleccion.giros,
+    p. ej. leída de un JSON) y retorna los libros elegidos en cada uno.
+    Se usa desde el panel ?debug=1 y benchmarks/bench_giros.py.
+    """
+    if indice is None:
+        indice = IndiceCatalogo(df)
+
+    return [
+        seleccionar_libro(
+            df, giro["perfil"], giro["edad_nina"],
+            indice=indice,
+            rng=random.Random(giro["semilla"]),
+            hoy=datetime.fromisoformat(giro["hoy"]),
+            **giro["filtros"]
+        )
+        for giro in giros
+    ]
+
+
+def coinciden_giros(giros, libros):
+    """Cuántos giros reproducidos eligieron el mismo libro que al grabarlos"""
+    return sum(
+        giro["libro_id"] == (None if libro is None else int(libro["id"]))
+        for giro, libro in zip(giros, libros)
+    )
 
 
 def obtener_mensaje_modo(modo, hay_libros):
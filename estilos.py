@@ -1,7 +1,9 @@
 # estilos.py
 import streamlit as st
+import json
 import random
-import time
+
+from portadas import es_url_portada, portada
 
 
 def aplicar_tema_infantil():
@@ -215,80 +217,88 @@ def celebrar_logro(mensaje, tipo="lectura"):
     """, unsafe_allow_html=True)
 
 
-# estilos.py - Nueva versión de ruleta_magica con portadas
+# ---------------- RULETA ----------------
+# (cuadros, segundos por cuadro, estilo) de cada fase de la animación
+FASES_RULETA = [
+    (15, 0.05, "font-size: 24px; background: white; padding: 20px; border: 3px solid #ffd1dc;", "✨"),
+    (8, 0.15, "font-size: 28px; background: linear-gradient(135deg, #fff0f5, #ffe4ec); padding: 25px; border: 3px solid #ff69b4;", "🌟"),
+    (5, 0.25, "font-size: 30px; background: linear-gradient(135deg, #fecfef, #ff9a9e); padding: 25px;", "🎯"),
+]
+DURACION_RULETA = sum(cuadros * pausa for cuadros, pausa, _, _ in FASES_RULETA)
+MAX_TITULOS_RULETA = 60
+
+PLANTILLA_RULETA = """
+<div id="ruleta" style="text-align: center; border-radius: 15px; color: #333;
+     font-family: 'Source Sans Pro', sans-serif; box-sizing: border-box;"></div>
+<script>
+const datos = __DATOS__;
+const ruleta = document.getElementById("ruleta");
+const pasos = [];
+for (const [cuadros, pausa, estilo, emoji] of datos.fases) {
+    for (let i = 0; i < cuadros; i++) pasos.push([pausa, estilo, emoji]);
+}
+let paso = 0;
+// Cada cuadro parte del estilo base: el de la fase reemplaza al anterior
+const base = ruleta.style.cssText;
+function mostrar(titulo, estilo, emoji) {
+    ruleta.style.cssText = base + estilo;
+    ruleta.textContent = emoji + " " + titulo + " " + emoji;
+}
+function girar() {
+    if (paso >= pasos.length) {
+        const [, estilo] = pasos[pasos.length - 1];
+        mostrar(datos.ganador, estilo, "🎉");
+        return;
+    }
+    const [pausa, estilo, emoji] = pasos[paso++];
+    mostrar(datos.titulos[Math.floor(Math.random() * datos.titulos.length)], estilo, emoji);
+    setTimeout(girar, pausa * 1000);
+}
+girar();
+</script>
+"""
+
+
+def ruleta_magica(titulos, ganador, portada_ganador=None, rng=None):
+    """
+    Ruleta con animación en el navegador: se envían una sola vez los
+    títulos candidatos y el ganador, y el giro corre del lado del cliente
+    (el servidor no espera los ~3 segundos de la animación).
+    """
+    
+    rng = rng or random
+    
+    # Acotar el mensaje: con muestra de títulos alcanza para la animación
+    if len(titulos) > MAX_TITULOS_RULETA:
+        titulos = rng.sample(titulos, MAX_TITULOS_RULETA)
+    
+    datos = json.dumps({
+        "titulos": titulos or [ganador],
+        "ganador": ganador,
+        "fases": FASES_RULETA,
+    }, ensure_ascii=False).replace("</", "<\\/")
+    
+    st.iframe(PLANTILLA_RULETA.replace("__DATOS__", datos), height=110)
 
-# estilos.py - Función ruleta_magica SIN portada al final
 
-def ruleta_magica(titulos, ganador, portada_ganador=None):
-    """Ruleta con animación - solo muestra título al final"""
-    
-    placeholder = st.empty()
-    
-    # Fase 1: Muy rápido
-    for _ in range(15):
-        titulo_random = random.choice(titulos)
-        with placeholder.container():
-            st.markdown(f"""
-            <div style='
-                text-align: center; 
-                font-size: 24px;
-                background: white;
-                padding: 20px;
-                border-radius: 15px;
-                border: 3px solid #ffd1dc;
-                color: #333;
-            '>
-                ✨ {titulo_random} ✨
-            </div>
-            """, unsafe_allow_html=True)
-        time.sleep(0.05)
-    
-    # Fase 2: Más lento
-    for _ in range(8):
-        titulo_random = random.choice(titulos)
-        with placeholder.container():
-            st.markdown(f"""
-            <div style='
-                text-align: center; 
-                font-size: 28px;
-                background: linear-gradient(135deg, #fff0f5, #ffe4ec);
-                padding: 25px;
-                border-radius: 15px;
-                border: 3px solid #ff69b4;
-                color: #333;
-            '>
-                🌟 {titulo_random} 🌟
-            </div>
-            """, unsafe_allow_html=True)
-        time.sleep(0.15)
-    
-    # Fase 3: Aún más lento
-    for _ in range(5):
-        titulo_random = random.choice(titulos)
-        with placeholder.container():
-            st.markdown(f"""
-            <div style='
-                text-align: center; 
-                font-size: 30px;
-                background: linear-gradient(135deg, #fecfef, #ff9a9e);
-                padding: 25px;
-                border-radius: 15px;
-                color: #333;
-            '>
-                🎯 {titulo_random} 🎯
-            </div>
-            """, unsafe_allow_html=True)
-        time.sleep(0.25)
-    
-    # Fase 4: Revelar ganador - SOLO TÍTULO, SIN PORTADA
-    placeholder.empty()  # Limpiar el placeholder
+def revelar_con_retraso(key, segundos=DURACION_RULETA):
+    """
+    Oculta el contenedor con esa key hasta que termine la ruleta del
+    navegador y luego lo muestra con una transición (solo CSS).
+    """
+    st.markdown(f"""
+    <style>
+    @keyframes revelar {{ from {{ opacity: 0; }} to {{ opacity: 1; }} }}
+    .st-key-{key} {{ animation: revelar 0.4s ease {segundos}s both; }}
+    </style>
+    """, unsafe_allow_html=True)
 
 # Agregar al final de estilos.py
 
 def mostrar_portada(url, ancho=200):
     """Muestra la portada de un libro"""
-    if url and str(url).startswith("http"):
-        st.image(url, width=ancho)
+    if es_url_portada(url):
+        st.image(portada(url, ancho), width=ancho)
     else:
         # Placeholder si no hay imagen
         st.markdown(f"""
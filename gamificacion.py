@@ -1,20 +1,38 @@
 # gamificacion.py
+import copy
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
 # ---------------- LOGROS ----------------
+# Cada logro es una regla: se desbloquea cuando la métrica llega a la meta
 LOGROS = {
-    "primera_lectura": {"icono": "🌟", "nombre": "Primera Aventura", "desc": "¡Leíste tu primer libro!"},
-    "racha_3": {"icono": "🔥", "nombre": "En Llamas", "desc": "3 días seguidos leyendo"},
-    "racha_7": {"icono": "⚡", "nombre": "Súper Lectora", "desc": "7 días seguidos leyendo"},
-    "explorador_5": {"icono": "🗺️", "nombre": "Exploradora", "desc": "5 libros diferentes"},
-    "explorador_20": {"icono": "🧭", "nombre": "Gran Exploradora", "desc": "20 libros diferentes"},
-    "favoritos_3": {"icono": "💖", "nombre": "Coleccionista", "desc": "3 libros favoritos"},
-    "libro_largo": {"icono": "📚", "nombre": "Maratonista", "desc": "Libro de +15 minutos"},
-    "nocturna": {"icono": "🌙", "nombre": "Lectura Nocturna", "desc": "Leer después de las 8pm"},
-    "madrugadora": {"icono": "🌅", "nombre": "Madrugadora", "desc": "Leer antes de las 9am"},
+    "primera_lectura": {"icono": "🌟", "nombre": "Primera Aventura", "desc": "¡Leíste tu primer libro!", "metrica": "total_lecturas", "meta": 1},
+    "racha_3": {"icono": "🔥", "nombre": "En Llamas", "desc": "3 días seguidos leyendo", "metrica": "racha", "meta": 3},
+    "racha_7": {"icono": "⚡", "nombre": "Súper Lectora", "desc": "7 días seguidos leyendo", "metrica": "racha", "meta": 7},
+    "explorador_5": {"icono": "🗺️", "nombre": "Exploradora", "desc": "5 libros diferentes", "metrica": "libros_unicos", "meta": 5},
+    "explorador_20": {"icono": "🧭", "nombre": "Gran Exploradora", "desc": "20 libros diferentes", "metrica": "libros_unicos", "meta": 20},
+    "favoritos_3": {"icono": "💖", "nombre": "Coleccionista", "desc": "3 libros favoritos", "metrica": "favoritos", "meta": 3},
+    "libro_largo": {"icono": "📚", "nombre": "Maratonista", "desc": "Libro de +15 minutos", "metrica": "libros_largos", "meta": 1},
+    "nocturna": {"icono": "🌙", "nombre": "Lectura Nocturna", "desc": "Leer después de las 8pm", "metrica": "lecturas_nocturnas", "meta": 1},
+    "madrugadora": {"icono": "🌅", "nombre": "Madrugadora", "desc": "Leer antes de las 9am", "metrica": "lecturas_madrugada", "meta": 1},
 }
 
+# Métricas de EstadisticasPerfil que pueden usar las reglas (orden del vector)
+METRICAS = [
+    "total_lecturas", "libros_unicos", "favoritos", "libros_largos",
+    "racha", "lecturas_nocturnas", "lecturas_madrugada",
+]
+
+DURACION_LIBRO_LARGO = 15
+HORA_NOCTURNA = 20
+HORA_MADRUGADA = 9
+
+# Reglas compiladas: una posición por logro, en el orden de LOGROS
+_CLAVES_LOGROS = list(LOGROS)
+_METRICA_LOGROS = np.array([METRICAS.index(LOGROS[k]["metrica"]) for k in _CLAVES_LOGROS])
+_METAS_LOGROS = np.array([LOGROS[k]["meta"] for k in _CLAVES_LOGROS], dtype=float)
+
 # ---------------- NIVELES ----------------
 NIVELES = [
     {"nivel": 1, "nombre": "Semillita", "icono": "🌱", "libros": 0},
@@ -43,8 +61,80 @@ def obtener_siguiente_nivel(total_libros):
     return None
 
 
-def calcular_racha(df_perfil):
-    """Calcula días consecutivos de lectura"""
+class TrackerRacha:
+    """
+    Racha de lectura de un perfil: días seguidos hasta el último día leído
+    y la mejor racha histórica. Registrar un día es O(1); solo si llega un
+    día anterior al último (datos desordenados) se recalcula desde cero,
+    una vez, en la siguiente consulta.
+    """
+
+    def __init__(self):
+        self.ultimo_dia = None
+        self.racha = 0
+        self.mejor = 0
+        self._dias = set()
+        self._desordenado = False
+
+    def registrar(self, dia):
+        """Registra un día con lectura"""
+        if dia in self._dias:
+            return
+        self._dias.add(dia)
+
+        if self.ultimo_dia is None or dia == self.ultimo_dia + timedelta(days=1):
+            self.racha += 1
+            self.ultimo_dia = dia
+        elif dia > self.ultimo_dia:
+            self.racha = 1
+            self.ultimo_dia = dia
+        else:
+            self._desordenado = True
+            return
+
+        self.mejor = max(self.mejor, self.racha)
+
+    def _recalcular(self):
+        racha = mejor = 0
+        anterior = None
+        for dia in sorted(self._dias):
+            if anterior is not None and dia - anterior == timedelta(days=1):
+                racha += 1
+            else:
+                racha = 1
+            mejor = max(mejor, racha)
+            anterior = dia
+
+        self.ultimo_dia = anterior
+        self.racha = racha
+        self.mejor = mejor
+        self._desordenado = False
+
+    def actual(self, hoy=None):
+        """Racha vigente: se corta si no hubo lectura ni hoy ni ayer"""
+        if self._desordenado:
+            self._recalcular()
+        hoy = hoy or datetime.now().date()
+        if self.ultimo_dia is None or self.ultimo_dia < hoy - timedelta(days=1):
+            return 0
+        return self.racha
+
+    def mejor_racha(self):
+        """Mayor cantidad de días seguidos leyendo"""
+        if self._desordenado:
+            self._recalcular()
+        return self.mejor
+
+
+def calcular_racha(df_perfil, resumen=None):
+    """
+    Calcula días consecutivos de lectura.
+    Con el resumen del registro de lecturas usa su racha incremental (todos
+    los días leídos); sin él, solo la última lectura de cada libro.
+    """
+    if resumen is not None:
+        return resumen.racha.actual()
+    
     if df_perfil.empty:
         return 0
     
@@ -71,53 +161,103 @@ def calcular_racha(df_perfil):
     return racha
 
 
-def obtener_logros_desbloqueados(df_perfil):
+# ---------------- ESTADÍSTICAS ----------------
+class EstadisticasPerfil:
+    """
+    Números de un perfil calculados de una sola pasada: lecturas, libros,
+    favoritos, minutos, racha, nivel y logros. La app arma uno por versión
+    de los datos y lo comparten la barra lateral, la ruleta, el diario, el
+    perfil y los logros. Tras una lectura, con_lectura() da el siguiente
+    sin volver a recorrer los datos.
+    """
+
+    def __init__(self, df_perfil, resumen=None):
+        self.vacio = df_perfil.empty
+        self.lecturas_nocturnas = 0
+        self.lecturas_madrugada = 0
+
+        if self.vacio:
+            self.total_lecturas = 0
+            self.libros_unicos = 0
+            self.favoritos = 0
+            self.minutos = 0
+            self.libros_largos = 0
+        else:
+            duracion = df_perfil["duracion_min"]
+            self.total_lecturas = df_perfil["veces_leido"].sum()
+            self.libros_unicos = df_perfil.shape[0]
+            self.favoritos = int((df_perfil["favorito"] == True).sum())
+            self.minutos = duracion.sum()
+            self.libros_largos = int((duracion > DURACION_LIBRO_LARGO).sum())
+
+            # Horas de lectura (todas las del registro si está disponible)
+            if resumen is not None:
+                por_hora = pd.Series(resumen.lecturas_por_hora, dtype=float)
+            else:
+                horas = pd.to_datetime(df_perfil["ultima_lectura"], errors="coerce").dt.hour
+                por_hora = horas.dropna().value_counts()
+            self.lecturas_nocturnas = int(por_hora[por_hora.index >= HORA_NOCTURNA].sum())
+            self.lecturas_madrugada = int(por_hora[por_hora.index < HORA_MADRUGADA].sum())
+
+        self.racha = calcular_racha(df_perfil, resumen)
+        self.mejor_racha = resumen.racha.mejor_racha() if resumen is not None else None
+        self._actualizar()
+
+    def _actualizar(self):
+        self.nivel = obtener_nivel(self.total_lecturas)
+        self.desbloqueados = evaluar_logros(self.vector()) & (not self.vacio)
+        self.logros = [k for k, ok in zip(_CLAVES_LOGROS, self.desbloqueados) if ok]
+
+    def vector(self):
+        """Valores de METRICAS, en ese orden"""
+        return np.array([getattr(self, m) for m in METRICAS], dtype=float)
+
+    def con_lectura(self, duracion, primera_vez, fecha, racha, mejor_racha=None):
+        """
+        Estadísticas tras una lectura más (modo incremental): suma el evento
+        a las métricas sin recorrer el catálogo ni el registro.
+        """
+        nuevas = copy.copy(self)
+        nuevas.vacio = False
+        nuevas.total_lecturas += 1
+        if primera_vez:
+            nuevas.libros_unicos += 1
+            nuevas.minutos += duracion
+            nuevas.libros_largos += int(duracion > DURACION_LIBRO_LARGO)
+        nuevas.lecturas_nocturnas += int(fecha.hour >= HORA_NOCTURNA)
+        nuevas.lecturas_madrugada += int(fecha.hour < HORA_MADRUGADA)
+        nuevas.racha = racha
+        if mejor_racha is not None:
+            nuevas.mejor_racha = mejor_racha
+        nuevas._actualizar()
+        return nuevas
+
+    def progreso_logros(self):
+        """{logro: (valor, meta)} de los logros aún bloqueados"""
+        valores = self.vector()[_METRICA_LOGROS]
+        return {
+            k: (int(valor), int(meta))
+            for k, valor, meta, ok in zip(_CLAVES_LOGROS, valores, _METAS_LOGROS, self.desbloqueados)
+            if not ok
+        }
+
+
+def evaluar_logros(vector):
+    """Evalúa todas las reglas de LOGROS de una vez; retorna una máscara en su orden"""
+    return vector[_METRICA_LOGROS] >= _METAS_LOGROS
+
+
+def obtener_logros_desbloqueados(df_perfil, resumen=None):
     """Determina qué logros están desbloqueados"""
-    if df_perfil.empty:
-        return []
-    
-    desbloqueados = []
-    
-    total_libros = df_perfil["veces_leido"].sum()
-    libros_unicos = df_perfil.shape[0]
-    total_favoritos = df_perfil[df_perfil["favorito"] == True].shape[0]
-    racha = calcular_racha(df_perfil)
-    
-    # Verificar logros por cantidad
-    if total_libros >= 1:
-        desbloqueados.append("primera_lectura")
-    if racha >= 3:
-        desbloqueados.append("racha_3")
-    if racha >= 7:
-        desbloqueados.append("racha_7")
-    if libros_unicos >= 5:
-        desbloqueados.append("explorador_5")
-    if libros_unicos >= 20:
-        desbloqueados.append("explorador_20")
-    if total_favoritos >= 3:
-        desbloqueados.append("favoritos_3")
-    
-    # Verificar libro largo
-    if not df_perfil[df_perfil["duracion_min"] > 15].empty:
-        desbloqueados.append("libro_largo")
-    
-    # Verificar hora de lectura
-    horas = pd.to_datetime(df_perfil["ultima_lectura"], errors="coerce").dt.hour
-    if any(horas >= 20):
-        desbloqueados.append("nocturna")
-    if any(horas < 9):
-        desbloqueados.append("madrugadora")
-    
-    return desbloqueados
+    return EstadisticasPerfil(df_perfil, resumen).logros
 
 
-def verificar_nuevo_logro(df_perfil_anterior, df_perfil_nuevo):
-    """Verifica si se desbloqueó un nuevo logro"""
-    logros_antes = set(obtener_logros_desbloqueados(df_perfil_anterior))
-    logros_ahora = set(obtener_logros_desbloqueados(df_perfil_nuevo))
-    
-    nuevos = logros_ahora - logros_antes
-    
-    if nuevos:
-        return list(nuevos)[0]  # Retorna el primer nuevo logro
-    return None
+def verificar_nuevos_logros(estadisticas_antes, estadisticas_despues):
+    """
+    Compara las estadísticas de antes y después de una lectura.
+    Retorna (nuevos, progreso): todos los logros recién desbloqueados y el
+    avance {logro: (valor, meta)} de los que siguen bloqueados.
+    """
+    nuevos_mask = estadisticas_despues.desbloqueados & ~estadisticas_antes.desbloqueados
+    nuevos = [k for k, nuevo in zip(_CLAVES_LOGROS, nuevos_mask) if nuevo]
+    return nuevos, estadisticas_despues.progreso_logros()
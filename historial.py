@@ -3,20 +3,21 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import calendar
-from gamificacion import (
-    calcular_racha, obtener_nivel, obtener_logros_desbloqueados, LOGROS
-)
+from gamificacion import EstadisticasPerfil, LOGROS
+from portadas import es_url_portada, portada
 
 
-def mostrar_calendario_lecturas(df_perfil, mes=None, año=None):
+def mostrar_calendario_lecturas(df_perfil, mes=None, año=None, resumen=None):
     """Muestra un calendario visual con los días de lectura"""
     hoy = datetime.now()
     mes = mes or hoy.month
     año = año or hoy.year
     
-    # Obtener fechas de lectura
+    # Obtener fechas de lectura (todas las del registro si está disponible)
     fechas_lectura = set()
-    if not df_perfil.empty:
+    if resumen is not None:
+        fechas_lectura = resumen.dias
+    elif not df_perfil.empty:
         fechas_lectura = set(
             pd.to_datetime(df_perfil["ultima_lectura"], errors="coerce")
             .dt.date.dropna()
@@ -74,13 +75,18 @@ def mostrar_calendario_lecturas(df_perfil, mes=None, año=None):
     st.caption("🌟 = Día con lectura | 📍 = Hoy")
 
 
+def lecturas_recientes(df_perfil, n=10):
+    """Últimos n libros leídos (los que muestra la lista del diario)"""
+    return df_perfil.sort_values("ultima_lectura", ascending=False).head(n)
+
+
 def mostrar_lista_lecturas(df_perfil):
     """Muestra lista cronológica de lecturas con portadas"""
     if df_perfil.empty:
         st.info("No hay lecturas registradas aún.")
         return
     
-    df_ordenado = df_perfil.sort_values("ultima_lectura", ascending=False).head(10)
+    df_ordenado = lecturas_recientes(df_perfil)
     
     for _, libro in df_ordenado.iterrows():
         fecha_dt = pd.to_datetime(libro["ultima_lectura"], errors="coerce")
@@ -92,8 +98,8 @@ def mostrar_lista_lecturas(df_perfil):
             
             with col_img:
                 portada_url = libro.get("portada_url", "")
-                if portada_url and str(portada_url).startswith("http"):
-                    st.image(portada_url, width=80)
+                if es_url_portada(portada_url):
+                    st.image(portada(portada_url, 80), width=80)
                 else:
                     st.markdown("<div style='font-size: 50px; text-align: center;'>📖</div>", unsafe_allow_html=True)
             
@@ -102,11 +108,13 @@ def mostrar_lista_lecturas(df_perfil):
                 st.caption(f"📅 {fecha} · ⏱️ {libro['duracion_min']} min · 🔄 {libro['veces_leido']}x")
 
 
-def mostrar_logros(df_perfil):
+def mostrar_logros(df_perfil, resumen=None, estadisticas=None):
     """Muestra logros desbloqueados y bloqueados"""
     st.markdown("### 🏆 Mis Logros")
     
-    desbloqueados = obtener_logros_desbloqueados(df_perfil)
+    estadisticas = estadisticas or EstadisticasPerfil(df_perfil, resumen)
+    desbloqueados = estadisticas.logros
+    progreso = estadisticas.progreso_logros()
     
     cols = st.columns(3)
     for i, (key, logro) in enumerate(LOGROS.items()):
@@ -128,6 +136,7 @@ def mostrar_logros(df_perfil):
                 </div>
                 """, unsafe_allow_html=True)
             else:
+                valor, meta = progreso[key]
                 st.markdown(f"""
                 <div style="
                     text-align: center;
@@ -139,17 +148,16 @@ def mostrar_logros(df_perfil):
                 ">
                     <span style="font-size: 40px;">🔒</span><br>
                     <strong style="color: #666666;">???</strong><br>
-                    <small style="color: #888888;">{logro['desc']}</small>
+                    <small style="color: #888888;">{logro['desc']}</small><br>
+                    <small style="color: #888888;">{min(valor, meta)}/{meta}</small>
                 </div>
                 """, unsafe_allow_html=True)
 
 
-def pagina_historial(df, perfil):
+def pagina_historial(df_perfil, perfil, resumen=None, estadisticas=None):
     """Página principal del historial/diario de lecturas"""
     st.header("📖 Mi Diario de Lecturas")
     
-    df_perfil = df[df["ultima_lectora"] == perfil].copy()
-    
     if df_perfil.empty:
         st.info("¡Aún no hay lecturas! Gira la ruleta para comenzar 🎡")
         return
@@ -157,15 +165,12 @@ def pagina_historial(df, perfil):
     # Resumen visual
     col1, col2, col3, col4 = st.columns(4)
     
-    racha = calcular_racha(df_perfil)
-    nivel = obtener_nivel(df_perfil["veces_leido"].sum())
-    total_lecturas = df_perfil["veces_leido"].sum()
-    minutos = df_perfil["duracion_min"].sum()
+    estadisticas = estadisticas or EstadisticasPerfil(df_perfil, resumen)
     
-    col1.metric("🔥 Racha", f"{racha} días")
-    col2.metric("📚 Lecturas", total_lecturas)
-    col3.metric("⏱️ Minutos", minutos)
-    col4.metric("⭐ Nivel", nivel["nombre"])
+    col1.metric("🔥 Racha", f"{estadisticas.racha} días")
+    col2.metric("📚 Lecturas", estadisticas.total_lecturas)
+    col3.metric("⏱️ Minutos", estadisticas.minutos)
+    col4.metric("⭐ Nivel", estadisticas.nivel["nombre"])
     
     st.divider()
     
@@ -182,11 +187,12 @@ def pagina_historial(df, perfil):
         mostrar_calendario_lecturas(
             df_perfil, 
             mes=st.session_state.cal_mes, 
-            año=st.session_state.cal_año
+            año=st.session_state.cal_año,
+            resumen=resumen
         )
     
     with tab2:
         mostrar_lista_lecturas(df_perfil)
     
     with tab3:
-        mostrar_logros(df_perfil)
+        mostrar_logros(df_perfil, resumen, estadisticas)
@@ -0,0 +1,214 @@
+# hogares.py
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from almacenamiento import leer_config
+from perfiles import PERFILES
+
+log = logging.getLogger(__name__)
+
+CUOTA_MB_POR_DEFECTO = 256
+
+_FALTA = object()
+
+
+# ---------------- HOGAR DE LA SESIÓN ----------------
+def resolver_hogar():
+    """
+    Hogar de la sesión, resuelto una sola vez y guardado en session_state:
+    parámetro ?hogar= de la URL o variable LECTURA_HOGAR. Un hogar que no
+    está en [almacenamiento.hogares] detiene la app.
+
+    Sin hogar se usa el hogar por defecto (None, la configuración de
+    siempre) solo si no hay hogares configurados o si
+    hogar_por_defecto = true en [almacenamiento]; si no, la app pide el
+    hogar, para que una visita sin ?hogar= no vea los datos de otro.
+    """
+    if "hogar" not in st.session_state:
+        config = leer_config()
+        hogares = config.get("hogares", {})
+        hogar = st.query_params.get("hogar") or os.environ.get("LECTURA_HOGAR") or None
+        if hogar is not None and hogar not in hogares:
+            st.error(f"🏠 No conocemos el hogar «{hogar}».")
+            st.stop()
+        if hogar is None and hogares and not config.get("hogar_por_defecto", False):
+            st.info("🏠 Abre la app con el enlace de tu hogar (…?hogar=nombre).")
+            st.stop()
+        st.session_state.hogar = hogar
+    return st.session_state.hogar
+
+
+def perfiles_iniciales(hogar):
+    """Lectoras que se registran al abrir un hogar vacío"""
+    if hogar is None:
+        return PERFILES
+    return dict(leer_config(hogar).get("perfiles", {}))
+
+
+# ---------------- CACHÉ POR HOGAR ----------------
+def estimar_bytes(valor):
+    """Memoria aproximada de un valor cacheado"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if hasattr(valor, "bytes_estimados"):
+        return valor.bytes_estimados()
+    return sys.getsizeof(valor)
+
+
+class ParticionCache:
+    """
+    Caché LRU de un hogar con tope de memoria. Cada entrada puede tener una
+    versión (si cambia se vuelve a crear) y un ttl en segundos. Al pasar la
+    cuota se desalojan las entradas menos usadas de este hogar, nunca las
+    de otros, ni las fijas (p. ej. el catálogo, que la app modifica en el
+    lugar: desalojarlo perdería esos cambios).
+    """
+
+    def __init__(self, hogar, cuota_bytes):
+        self.hogar = hogar
+        self.cuota_bytes = cuota_bytes
+        self.bytes = 0
+        self._entradas = OrderedDict()  # clave -> (valor, version, creada, bytes)
+        self._lock = threading.Lock()
+        self._cargando = {}
+        self._fijas = set()
+
+    def _vigente(self, clave, version, ttl):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return _FALTA
+            valor, version_guardada, creada, _ = entrada
+            if version_guardada != version or (ttl is not None and time.monotonic() - creada > ttl):
+                return _FALTA
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def _lock_clave(self, clave):
+        with self._lock:
+            return self._cargando.setdefault(clave, threading.Lock())
+
+    def obtener(self, clave, crear, version=None, ttl=None, medir=estimar_bytes, fija=False, version_de=None):
+        """
+        Retorna el valor cacheado para clave, o lo crea con crear().
+        Si dos sesiones del hogar piden la misma clave, solo una lo crea.
+        Una clave fija no se desaloja por la cuota (sí al invalidarla o
+        al cambiar su versión). Con version_de, lo creado se guarda con la
+        versión que da version_de(valor) y no con la pedida (p. ej. un
+        catálogo que salió de una instantánea vieja).
+        """
+        if fija:
+            with self._lock:
+                self._fijas.add(clave)
+        valor = self._vigente(clave, version, ttl)
+        if valor is not _FALTA:
+            return valor
+
+        with self._lock_clave(clave):
+            valor = self._vigente(clave, version, ttl)
+            if valor is not _FALTA:
+                return valor
+            valor = crear()
+            if version_de is not None:
+                version = version_de(valor)
+            self._guardar(clave, valor, version, medir(valor))
+        return valor
+
+    def _guardar(self, clave, valor, version, tamaño):
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= anterior[3]
+            self._entradas[clave] = (valor, version, time.monotonic(), tamaño)
+            self.bytes += tamaño
+
+            # Desalojar lo menos usado, sin tocar la entrada recién guardada ni las fijas
+            while self.bytes > self.cuota_bytes:
+                victima = next((c for c in self._entradas if c != clave and c not in self._fijas), None)
+                if victima is None:
+                    break
+                self.bytes -= self._entradas.pop(victima)[3]
+
+            if self.bytes > self.cuota_bytes:
+                log.warning(
+                    "El hogar %s supera su cuota de caché (%s bytes de %s)",
+                    self.hogar, self.bytes, self.cuota_bytes
+                )
+
+    def reemplazar(self, clave, anterior, valor, version, medir=estimar_bytes):
+        """
+        Guarda valor en clave solo si lo cacheado sigue siendo anterior
+        (p. ej. al terminar una carga en segundo plano). Retorna si lo guardó.
+        """
+        with self._lock_clave(clave):
+            with self._lock:
+                entrada = self._entradas.get(clave)
+                if entrada is None or entrada[0] is not anterior:
+                    return False
+            self._guardar(clave, valor, version, medir(valor))
+        return True
+
+    def descartar(self, clave, anterior):
+        """Quita la entrada de clave solo si lo cacheado sigue siendo anterior"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] is anterior:
+                self.bytes -= self._entradas.pop(clave)[3]
+
+    def version(self, clave):
+        """Versión guardada de una entrada (None si no está)"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            return entrada[1] if entrada is not None else None
+
+    def revalidar(self, nombres, anterior, nueva):
+        """
+        Pasa a la versión nueva las entradas de esos nombres que estaban en
+        la anterior, sin recrearlas (sus valores ya reflejan el cambio).
+        """
+        with self._lock:
+            for clave, (valor, version, creada, tamaño) in list(self._entradas.items()):
+                if clave[0] in nombres and version == anterior:
+                    self._entradas[clave] = (valor, nueva, creada, tamaño)
+
+    def invalidar(self, nombre):
+        """Quita las entradas cuya clave empieza con nombre"""
+        with self._lock:
+            for clave in [c for c in self._entradas if c[0] == nombre]:
+                self.bytes -= self._entradas.pop(clave)[3]
+
+
+class CacheHogares:
+    """Una ParticionCache por hogar, con la cuota de [almacenamiento.hogares.<hogar>]"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._particiones = {}
+
+    def particion(self, hogar):
+        with self._lock:
+            if hogar not in self._particiones:
+                cuota_mb = leer_config(hogar).get("cuota_mb", CUOTA_MB_POR_DEFECTO)
+                self._particiones[hogar] = ParticionCache(hogar, int(cuota_mb * 1024 * 1024))
+            return self._particiones[hogar]
+
+
+@st.cache_resource
+def obtener_cache_hogares():
+    """Caché única por proceso, particionada por hogar"""
+    return CacheHogares()
+
+
+def cache_hogar(hogar):
+    """Partición de caché del hogar"""
+    return obtener_cache_hogares().particion(hogar)
@@ -0,0 +1,150 @@
+# instantaneas.py
+import hashlib
+import logging
+import os
+import threading
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from sheets import ESQUEMA_CATALOGO, get_backend, get_df, get_revision, marcar_carga
+
+log = logging.getLogger(__name__)
+
+DIRECTORIO_INSTANTANEAS = ".cache_catalogo"
+
+# Una instantánea guardada con otro esquema no se usa
+_VERSION_ESQUEMA = hashlib.sha1(repr(sorted(ESQUEMA_CATALOGO.items())).encode("utf-8")).hexdigest()[:12]
+
+_lock_reconciliando = threading.Lock()
+_reconciliando = set()
+
+
+# ---------------- INSTANTÁNEA EN DISCO ----------------
+def ruta_instantanea(hogar, directorio=DIRECTORIO_INSTANTANEAS):
+    return os.path.join(directorio, f"catalogo_{hogar or 'principal'}.feather")
+
+
+def guardar_instantanea(df, hogar, revision, directorio=DIRECTORIO_INSTANTANEAS):
+    """
+    Guarda el catálogo ya tipado (tal como lo da get_df, sin columnas de
+    perfiles) en Feather sin comprimir, junto con la revisión de los datos.
+    """
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({
+        **(tabla.schema.metadata or {}),
+        b"revision": str(revision).encode(),
+        b"esquema": _VERSION_ESQUEMA.encode(),
+    })
+
+    os.makedirs(directorio, exist_ok=True)
+    ruta = ruta_instantanea(hogar, directorio)
+    temporal = f"{ruta}.{threading.get_ident()}.tmp"
+    feather.write_feather(tabla, temporal, compression="uncompressed")
+    os.replace(temporal, ruta)
+
+
+def leer_instantanea(hogar, directorio=DIRECTORIO_INSTANTANEAS):
+    """
+    Retorna (df, revision) de la instantánea del hogar, leída con memory
+    map, o (None, None) si no hay una utilizable.
+    """
+    ruta = ruta_instantanea(hogar, directorio)
+    if not os.path.exists(ruta):
+        return None, None
+
+    try:
+        tabla = feather.read_table(ruta, memory_map=True)
+        metadatos = tabla.schema.metadata or {}
+        if metadatos.get(b"esquema") != _VERSION_ESQUEMA.encode():
+            return None, None
+        revision = int(metadatos[b"revision"])
+        df = tabla.to_pandas()
+    except Exception as e:
+        log.warning("No se pudo leer la instantánea %s: %s", ruta, e)
+        return None, None
+
+    marcar_carga(df)
+    return df, revision
+
+
+# ---------------- CARGA DEL CATÁLOGO ----------------
+def revision_datos(df):
+    """Revisión del backend de la que salió el catálogo (None si no se sabe)"""
+    return df.attrs.get("revision_datos")
+
+
+def cargar_catalogo_hogar(hogar, revision, cache, usar_instantanea=True, solo_vigente=False):
+    """
+    Catálogo para la caché del hogar sin esperar a la descarga completa:
+    - instantánea en la revisión actual: se usa tal cual
+    - instantánea vieja: se usa ya y se reconcilia en segundo plano (la
+      caché pasa al catálogo nuevo cuando termina). Con solo_vigente (al
+      reemplazar un catálogo ya cacheado, p. ej. porque otra sesión
+      escribió) no se usa: no se muestra un rerun con datos viejos
+    - sin instantánea, o con usar_instantanea = False (p. ej. al vencer
+      el ttl de respaldo): get_df, y se guarda para el próximo arranque
+    El catálogo lleva la revisión de sus datos (ver revision_datos), que
+    es con la que se guarda en la caché: la de la instantánea, no la actual.
+    """
+    df, revision_guardada = leer_instantanea(hogar) if usar_instantanea else (None, None)
+    if df is not None and solo_vigente and revision_guardada != revision:
+        df = None
+    if df is None:
+        df = get_df(hogar)[0]
+        df.attrs["revision_datos"] = revision
+        _guardar_sin_fallar(df, hogar, revision)
+        return df
+
+    df.attrs["revision_datos"] = revision_guardada
+    if revision_guardada != revision:
+        reconciliar_en_segundo_plano(hogar, cache, df)
+    return df
+
+
+def reconciliando(hogar):
+    """Si hay una reconciliación del catálogo del hogar en curso"""
+    with _lock_reconciliando:
+        return hogar in _reconciliando
+
+
+def reconciliar_en_segundo_plano(hogar, cache, anterior):
+    """Descarga el catálogo en un hilo y reemplaza anterior en la caché (una vez por hogar)"""
+    with _lock_reconciliando:
+        if hogar in _reconciliando:
+            return
+        _reconciliando.add(hogar)
+
+    threading.Thread(
+        target=_reconciliar, args=(hogar, cache, anterior, get_revision(anterior)),
+        name=f"instantanea-{hogar or 'principal'}", daemon=True
+    ).start()
+
+
+def _reconciliar(hogar, cache, anterior, revision_anterior):
+    try:
+        revision = get_backend(hogar).leer_revision()
+        df = get_df(hogar)[0]
+        df.attrs["revision_datos"] = revision
+        _guardar_sin_fallar(df, hogar, revision)
+        # Si mientras tanto la app modificó anterior (una escritura, las
+        # columnas de un perfil) no se reemplaza: esos cambios se perderían.
+        # Sigue en la caché con la revisión de la instantánea y el próximo
+        # rerun lo recarga desde la instantánea recién guardada.
+        # Si alguien recargó el catálogo, reemplazar deja el suyo.
+        if get_revision(anterior) == revision_anterior:
+            cache.reemplazar(("catalogo",), anterior, df, revision)
+    except Exception as e:
+        log.warning("No se pudo reconciliar el catálogo del hogar %s: %s", hogar, e)
+        # Que el próximo rerun vuelva a cargarlo en vez de seguir con el viejo
+        cache.descartar(("catalogo",), anterior)
+    finally:
+        with _lock_reconciliando:
+            _reconciliando.discard(hogar)
+
+
+def _guardar_sin_fallar(df, hogar, revision):
+    try:
+        guardar_instantanea(df, hogar, revision)
+    except Exception as e:
+        log.warning("No se pudo guardar la instantánea del hogar %s: %s", hogar, e)
@@ -0,0 +1,162 @@
+# lecturas.py
+import pandas as pd
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from gamificacion import TrackerRacha
+from sheets import get_columnas_perfil, nueva_carga
+
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+# Memoria aproximada de un evento con su parte de los agregados (para cuotas de caché)
+BYTES_POR_EVENTO = 400
+
+
+# ---------------- RESUMEN POR PERFIL ----------------
+class ResumenLecturas:
+    """
+    Agregados de lectura de un perfil, mantenidos al agregar eventos:
+    - total: número de lecturas
+    - veces_por_libro / primera_por_libro / ultima_por_libro
+    - lecturas_por_dia: cuántas lecturas hubo cada día
+    - lecturas_por_hora: cuántas lecturas hubo a cada hora (para logros)
+    - racha: racha actual y mejor racha (TrackerRacha)
+    - libros_por_dia: ids leídos cada día (para retos y calendario)
+    carga numera el resumen en el proceso (no se repite al recargar).
+    """
+
+    def __init__(self, perfil, duraciones=None):
+        self.perfil = perfil
+        self.carga = nueva_carga()
+        self.duraciones = duraciones if duraciones is not None else {}
+        self.total = 0
+        self.veces_por_libro = Counter()
+        self.primera_por_libro = {}
+        self.ultima_por_libro = {}
+        self.lecturas_por_dia = Counter()
+        self.libros_por_dia = defaultdict(list)
+        self.lecturas_por_hora = Counter()
+        self.racha = TrackerRacha()
+        self.ultima_lectura = None
+
+    def agregar(self, libro_id, fecha):
+        """Registra una lectura en O(1)"""
+        dia = fecha.date()
+
+        self.total += 1
+        self.veces_por_libro[libro_id] += 1
+        if libro_id not in self.primera_por_libro or fecha < self.primera_por_libro[libro_id]:
+            self.primera_por_libro[libro_id] = fecha
+        if libro_id not in self.ultima_por_libro or fecha > self.ultima_por_libro[libro_id]:
+            self.ultima_por_libro[libro_id] = fecha
+        self.lecturas_por_dia[dia] += 1
+        self.libros_por_dia[dia].append(libro_id)
+        self.lecturas_por_hora[fecha.hour] += 1
+        self.racha.registrar(dia)
+        if self.ultima_lectura is None or fecha > self.ultima_lectura:
+            self.ultima_lectura = fecha
+
+    @property
+    def dias(self):
+        """Días con al menos una lectura"""
+        return self.lecturas_por_dia.keys()
+
+    def libros_entre(self, desde, hasta):
+        """Ids leídos entre dos fechas (inclusive), recorriendo solo esos días"""
+        libros = []
+        dia = desde
+        while dia <= hasta:
+            libros.extend(self.libros_por_dia.get(dia, []))
+            dia += timedelta(days=1)
+        return libros
+
+
+# ---------------- REGISTRO ----------------
+class RegistroLecturas:
+    """Registro append-only de lecturas con un ResumenLecturas por perfil"""
+
+    def __init__(self, duraciones=None):
+        self.duraciones = duraciones if duraciones is not None else {}
+        self.eventos = []
+        self.resumenes = {}
+        self.incorporados = set()
+
+    def bytes_estimados(self):
+        return len(self.eventos) * BYTES_POR_EVENTO
+
+    def perfil(self, perfil):
+        """Retorna el resumen del perfil (vacío si no tiene lecturas)"""
+        if perfil not in self.resumenes:
+            self.resumenes[perfil] = ResumenLecturas(perfil, self.duraciones)
+        return self.resumenes[perfil]
+
+    def agregar(self, perfil, libro_id, fecha):
+        """Agrega un evento y actualiza los agregados del perfil"""
+        self.eventos.append({"perfil": perfil, "libro_id": libro_id, "fecha": fecha})
+        self.perfil(perfil).agregar(libro_id, fecha)
+
+
+def _parsear_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor
+    # Casi todos los eventos tienen FORMATO_FECHA: strptime es ~50 veces más
+    # rápido que pd.to_datetime, que queda para fechas con otro formato
+    try:
+        return datetime.strptime(valor, FORMATO_FECHA)
+    except (TypeError, ValueError):
+        pass
+    fecha = pd.to_datetime(valor, errors="coerce")
+    return None if pd.isna(fecha) else fecha.to_pydatetime()
+
+
+def construir_registro(eventos, df=None, perfiles=()):
+    """
+    Construye el registro a partir de los eventos guardados en el backend.
+
+    Si se pasa el catálogo, los libros que un perfil leyó antes de existir
+    el registro (ultima_<perfil> con fecha pero sin eventos) se incorporan
+    como una lectura en esa fecha, para no perder el historial anterior.
+    """
+    duraciones = {}
+    if df is not None and not df.empty:
+        duraciones = dict(zip(df["id"].astype(int), df["duracion_min"].astype(int)))
+
+    registro = RegistroLecturas(duraciones)
+
+    for evento in eventos:
+        fecha = _parsear_fecha(evento.get("fecha"))
+        if fecha is None:
+            continue
+        registro.agregar(evento["perfil"], int(evento["libro_id"]), fecha)
+
+    if df is not None:
+        for perfil in perfiles:
+            incorporar_anteriores(registro, df, perfil)
+
+    return registro
+
+
+def incorporar_anteriores(registro, df, perfil):
+    """
+    Incorpora una vez las lecturas del perfil anteriores al registro
+    (ultima_<perfil> con fecha pero sin eventos). Se llama cuando el
+    catálogo en memoria ya tiene las columnas del perfil.
+    """
+    cols = get_columnas_perfil(perfil)
+    if perfil in registro.incorporados or cols["ultima"] not in df.columns:
+        return
+    registro.incorporados.add(perfil)
+
+    resumen = registro.perfil(perfil)
+    anteriores = df[df[cols["ultima"]].notna()]
+    for libro_id, ultima in zip(anteriores["id"], anteriores[cols["ultima"]]):
+        libro_id = int(libro_id)
+        if libro_id not in resumen.veces_por_libro:
+            resumen.agregar(libro_id, ultima.to_pydatetime())
+
+
+def registrar_lectura(backend, registro, perfil, libro_id, fecha=None):
+    """Guarda el evento en el backend y actualiza el registro en memoria"""
+    fecha = fecha or datetime.now().replace(microsecond=0)
+    backend.agregar_lectura(perfil, libro_id, fecha.strftime(FORMATO_FECHA))
+    registro.agregar(perfil, libro_id, fecha)
+    return fecha
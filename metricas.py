@@ -0,0 +1,205 @@
+# metricas.py
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+import streamlit as st
+
+log = logging.getLogger(__name__)
+
+
+def configurar_log():
+    """
+    Las métricas de cada rerun van a stderr, una línea JSON por rerun, con
+    nivel INFO. LECTURA_LOG_METRICAS cambia el nivel (p. ej. WARNING las
+    apaga). No pasan al logger raíz, que Streamlit deja en WARNING.
+    """
+    nivel = os.environ.get("LECTURA_LOG_METRICAS", "INFO").upper()
+    log.setLevel(getattr(logging, nivel, logging.INFO))
+    if not log.handlers:
+        salida = logging.StreamHandler()
+        salida.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        log.addHandler(salida)
+    log.propagate = False
+
+
+configurar_log()
+
+# Llamadas de todo el proceso, incluidas las de la cola de escritura
+TOTALES = Counter()
+_lock_totales = threading.Lock()
+
+# Medición del rerun que corre en este hilo (None fuera de la app)
+_hilo = threading.local()
+
+
+# ---------------- MEDICIÓN POR RERUN ----------------
+class MedicionRerun:
+    """
+    Tiempos y llamadas de un rerun:
+    - tramos: {nombre: [veces, segundos, llamadas hechas dentro]}
+    - llamadas: cuántas veces se llamó a cada método contado (sheets.*, backend.*)
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fin = self.inicio
+        self.cerrada = False
+        self.tramos = {}
+        self.llamadas = Counter()
+        self._abiertos = []
+
+    @property
+    def milisegundos(self):
+        return (self.fin - self.inicio) * 1000
+
+    def resumen(self):
+        """Dict para el log y el panel"""
+        return {
+            "ms": round(self.milisegundos, 1),
+            "tramos": {
+                nombre: {"veces": veces, "ms": round(segundos * 1000, 1), "llamadas": llamadas}
+                for nombre, (veces, segundos, llamadas) in self.tramos.items()
+            },
+            "llamadas": dict(self.llamadas),
+        }
+
+
+def _actual():
+    return getattr(_hilo, "medicion", None)
+
+
+def iniciar_rerun():
+    """
+    Empieza la medición de este rerun. Si el anterior terminó con
+    st.rerun() o st.stop() (p. ej. tras guardar una lectura), se registra
+    ahora como interrumpido.
+    """
+    anterior = st.session_state.get("_medicion")
+    if anterior is not None and not anterior.cerrada:
+        _registrar(anterior, interrumpido=True)
+        st.session_state._medicion_interrumpida = anterior
+
+    medicion = MedicionRerun()
+    st.session_state._medicion = medicion
+    _hilo.medicion = medicion
+
+
+def cerrar_rerun():
+    """Termina la medición de este rerun y la registra; retorna la medición"""
+    medicion = _actual()
+    if medicion is None:
+        return None
+    medicion.fin = time.perf_counter()
+    _registrar(medicion, interrumpido=False)
+    _hilo.medicion = None
+    return medicion
+
+
+def _registrar(medicion, interrumpido):
+    medicion.cerrada = True
+    log.info(json.dumps(
+        {"evento": "rerun", "interrumpido": interrumpido, **medicion.resumen()},
+        ensure_ascii=False
+    ))
+
+
+@contextmanager
+def tramo(nombre):
+    """
+    Mide lo que corre dentro (también sirve como decorador). Los tramos con
+    el mismo nombre se suman; fuera de un rerun no hace nada.
+    """
+    medicion = _actual()
+    if medicion is None:
+        yield
+        return
+
+    inicio = time.perf_counter()
+    llamadas = [0]
+    medicion._abiertos.append(llamadas)
+    try:
+        yield
+    finally:
+        medicion._abiertos.pop()
+        medicion.fin = time.perf_counter()
+        datos = medicion.tramos.setdefault(nombre, [0, 0.0, 0])
+        datos[0] += 1
+        datos[1] += medicion.fin - inicio
+        datos[2] += llamadas[0]
+
+
+def contar(nombre):
+    """Cuenta una llamada en el proceso, en el rerun y en sus tramos abiertos"""
+    with _lock_totales:
+        TOTALES[nombre] += 1
+
+    medicion = _actual()
+    if medicion is not None:
+        medicion.llamadas[nombre] += 1
+        for llamadas in medicion._abiertos:
+            llamadas[0] += 1
+
+
+class ContadorLlamadas:
+    """Envuelve un objeto y cuenta cada llamada a sus métodos como prefijo.método"""
+
+    def __init__(self, objeto, prefijo):
+        self._objeto = objeto
+        self._prefijo = prefijo
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._objeto, nombre)
+        if nombre.startswith("_") or not callable(atributo):
+            return atributo
+
+        @wraps(atributo)
+        def contado(*args, **kwargs):
+            contar(f"{self._prefijo}.{nombre}")
+            return atributo(*args, **kwargs)
+        return contado
+
+
+# ---------------- PANEL ----------------
+def panel_visible():
+    """El panel aparece con ?debug=1 en la URL o LECTURA_DEBUG=1"""
+    return bool(st.query_params.get("debug") or os.environ.get("LECTURA_DEBUG"))
+
+
+def _mostrar_medicion(titulo, medicion):
+    resumen = medicion.resumen()
+    st.caption(f"{titulo}: {resumen['ms']:.0f} ms")
+    filas = sorted(resumen["tramos"].items(), key=lambda t: -t[1]["ms"])
+    if filas:
+        st.dataframe([{"tramo": nombre, **datos} for nombre, datos in filas], hide_index=True)
+    if resumen["llamadas"]:
+        st.dataframe(
+            [{"llamada": nombre, "veces": veces} for nombre, veces in sorted(resumen["llamadas"].items())],
+            hide_index=True
+        )
+
+
+def mostrar_panel_metricas():
+    """Cierra la medición del rerun y, si el panel está visible, la muestra en la barra lateral"""
+    medicion = cerrar_rerun()
+    if medicion is None or not panel_visible():
+        return
+
+    with st.sidebar.expander("🔧 Tiempos del rerun"):
+        _mostrar_medicion("Este rerun", medicion)
+        interrumpida = st.session_state.pop("_medicion_interrumpida", None)
+        if interrumpida is not None:
+            _mostrar_medicion("Rerun anterior (interrumpido)", interrumpida)
+        with _lock_totales:
+            totales = dict(TOTALES)
+        if totales:
+            st.caption("Llamadas del proceso")
+            st.dataframe(
+                [{"llamada": nombre, "veces": veces} for nombre, veces in sorted(totales.items())],
+                hide_index=True
+            )
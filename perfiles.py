@@ -1,6 +1,13 @@
 # perfiles.py
 import streamlit as st
-from gamificacion import obtener_nivel, obtener_siguiente_nivel, calcular_racha, NIVELES
+from gamificacion import EstadisticasPerfil, obtener_siguiente_nivel, NIVELES
+
+# ---------------- PERFILES ----------------
+# Lectoras iniciales; las demás se registran desde la app (sheets.registrar_perfil)
+PERFILES = {
+    "Clara": "🐭",
+    "Gracia": "🐥"
+}
 
 # ---------------- AVATARES ----------------
 AVATARES = {
@@ -14,19 +21,38 @@ AVATARES = {
     }
 }
 
+AVATARES_POR_DEFECTO = {
+    "opciones": ["📖", "🐼", "🐨", "🦁", "🐙", "🦖"],
+    "fondos": ["🌈", "⭐", "🌙", "🌸", "☀️", "🍭"]
+}
+
+
+def obtener_avatares(perfil, icono=None):
+    """Opciones de avatar y fondo de un perfil (el icono registrado va primero)"""
+    avatares = AVATARES.get(perfil, AVATARES_POR_DEFECTO)
+    opciones = avatares["opciones"]
+    if icono and icono not in opciones:
+        opciones = [icono] + opciones
+    return {"opciones": opciones, "fondos": avatares["fondos"]}
 
-def inicializar_avatar_state():
-    """Inicializa el estado de avatares si no existe"""
+
+def inicializar_avatar_state(perfiles=PERFILES):
+    """Inicializa el estado de avatares de los perfiles que no lo tengan"""
     if "avatares" not in st.session_state:
-        st.session_state.avatares = {
-            "Clara": {"avatar": "🐭", "fondo": "🌸"},
-            "Gracia": {"avatar": "🐥", "fondo": "🌻"}
-        }
+        st.session_state.avatares = {}
+    for perfil, icono in perfiles.items():
+        if perfil not in st.session_state.avatares:
+            st.session_state.avatares[perfil] = {
+                "avatar": icono,
+                "fondo": obtener_avatares(perfil)["fondos"][0]
+            }
 
 
-def pagina_perfil(perfil, df_perfil):
+def pagina_perfil(perfil, df_perfil, resumen=None, estadisticas=None, icono=None):
     """Página de perfil con avatar y estadísticas"""
-    inicializar_avatar_state()
+    inicializar_avatar_state({perfil: icono or PERFILES.get(perfil, "📖")})
+    avatares = obtener_avatares(perfil, icono)
+    estadisticas = estadisticas or EstadisticasPerfil(df_perfil, resumen)
     
     st.header(f"👤 Mi Perfil: {perfil}")
     
@@ -39,15 +65,15 @@ def pagina_perfil(perfil, df_perfil):
         
         nuevo_avatar = st.selectbox(
             "🎭 Mi personaje",
-            AVATARES[perfil]["opciones"],
-            index=AVATARES[perfil]["opciones"].index(avatar_actual) if avatar_actual in AVATARES[perfil]["opciones"] else 0,
+            avatares["opciones"],
+            index=avatares["opciones"].index(avatar_actual) if avatar_actual in avatares["opciones"] else 0,
             key=f"avatar_{perfil}"
         )
         
         nuevo_fondo = st.selectbox(
             "🖼️ Mi fondo",
-            AVATARES[perfil]["fondos"],
-            index=AVATARES[perfil]["fondos"].index(fondo_actual) if fondo_actual in AVATARES[perfil]["fondos"] else 0,
+            avatares["fondos"],
+            index=avatares["fondos"].index(fondo_actual) if fondo_actual in avatares["fondos"] else 0,
             key=f"fondo_{perfil}"
         )
         
@@ -73,11 +99,9 @@ def pagina_perfil(perfil, df_perfil):
     with col2:
         if df_perfil.empty:
             st.info("¡Aún no hay lecturas! Gira la ruleta para comenzar 🎡")
-            total_leidos = 0
-        else:
-            total_leidos = df_perfil["veces_leido"].sum()
         
-        nivel = obtener_nivel(total_leidos)
+        total_leidos = estadisticas.total_lecturas
+        nivel = estadisticas.nivel
         
         # CORREGIDO: color de texto más oscuro
         st.markdown(f"""
@@ -106,11 +130,11 @@ def pagina_perfil(perfil, df_perfil):
         
         # Estadísticas rápidas
         if not df_perfil.empty:
-            racha = calcular_racha(df_perfil)
-            favoritos = df_perfil[df_perfil["favorito"] == True].shape[0]
-            minutos = df_perfil["duracion_min"].sum()
-            
             c1, c2, c3 = st.columns(3)
-            c1.metric("🔥 Racha", f"{racha} días")
-            c2.metric("⭐ Favoritos", favoritos)
-            c3.metric("⏱️ Minutos", minutos)
+            c1.metric("🔥 Racha", f"{estadisticas.racha} días")
+            c2.metric("⭐ Favoritos", estadisticas.favoritos)
+            c3.metric("⏱️ Minutos", estadisticas.minutos)
+            
+            if estadisticas.mejor_racha is not None:
+                mejor = estadisticas.mejor_racha
+                st.caption(f"🏅 Mejor racha: **{mejor} {'día' if mejor == 1 else 'días'}** seguidos")
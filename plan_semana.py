@@ -0,0 +1,62 @@
+# plan_semana.py
+import streamlit as st
+
+from eleccion_libros import seleccionar_libros, obtener_mensaje_modo
+from estilos import mostrar_portada
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+MODOS_PLAN = {
+    "🎡 Sorpresa": ("default", dict()),
+    "🌙 Cortito": ("cortito", dict(max_duracion=7)),
+    "⭐ Favoritos": ("favoritos", dict(solo_favoritos=True)),
+    "🆕 Nuevos": ("nuevos", dict(solo_nuevos=True)),
+}
+
+
+def pagina_plan(df, perfil, indice=None, rng=None):
+    """Página con el plan de lecturas de los próximos días"""
+    st.header("🗓️ Plan de la semana")
+
+    col_edad, col_dias = st.columns(2)
+    with col_edad:
+        edad = st.slider("👧 Edad", 2, 9, 5, key="plan_edad")
+    with col_dias:
+        k = st.slider("📅 Días", 3, 7, 7, key="plan_dias")
+
+    modo = st.radio("📚 Modo", list(MODOS_PLAN.keys()), horizontal=True, key="plan_modo")
+    modo_key, filtros = MODOS_PLAN[modo]
+
+    key_plan = f"plan_{perfil}"
+
+    if st.button("🗓️ ¡Armar mi semana!", use_container_width=True):
+        st.session_state[key_plan] = seleccionar_libros(
+            df,
+            perfil=perfil,
+            edad_nina=edad,
+            k=k,
+            indice=indice,
+            rng=rng,
+            **filtros
+        )
+        if st.session_state[key_plan].empty:
+            st.warning(obtener_mensaje_modo(modo_key, False))
+
+    plan = st.session_state.get(key_plan)
+    if plan is None or plan.empty:
+        return
+
+    if len(plan) < k:
+        st.info(f"📚 Solo encontramos libros para {len(plan)} de {k} días.")
+
+    for _, libro in plan.iterrows():
+        with st.container(border=True):
+            col_img, col_info = st.columns([1, 3])
+
+            with col_img:
+                mostrar_portada(libro.get("portada_url", ""), ancho=80)
+
+            with col_info:
+                dia = libro["dia"]
+                st.markdown(f"**{DIAS_SEMANA[dia.weekday()]} {dia.day}** · {libro['titulo']}")
+                st.caption(f"⏱️ {libro['duracion_min']} min · 📍 {libro['ubicacion']}")
@@ -0,0 +1,224 @@
+# portadas.py
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+log = logging.getLogger(__name__)
+
+DIRECTORIO_PORTADAS = ".cache_portadas"
+MAX_BYTES_PORTADAS = 50 * 1024 * 1024
+TIMEOUT_DESCARGA = 10
+HILOS_PRECARGA = 4
+# Segundos que no se reintenta una portada que no se pudo descargar
+TTL_FALLIDAS = 600
+
+
+class CachePortadas:
+    """
+    Caché en disco de portadas reducidas.
+    Cada portada se descarga una sola vez por ancho pedido (180px para la
+    tarjeta, 80px para la lista) y se guarda como JPEG. Cuando el directorio
+    supera max_bytes se borran las menos usadas (LRU por fecha de acceso,
+    que se actualiza en cada lectura). Una URL que falló no se vuelve a
+    intentar hasta pasados ttl_fallidas segundos.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_PORTADAS, max_bytes=MAX_BYTES_PORTADAS, ttl_fallidas=TTL_FALLIDAS):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ttl_fallidas = ttl_fallidas
+        self._lock = threading.Lock()
+        self._fallidas = {}  # url -> momento del último fallo
+        os.makedirs(directorio, exist_ok=True)
+        self._total = sum(
+            os.path.getsize(os.path.join(directorio, nombre))
+            for nombre in os.listdir(directorio)
+        )
+
+    def _ruta(self, url, ancho):
+        clave = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directorio, f"{clave}_{ancho}.jpg")
+
+    def contiene(self, url, ancho):
+        return os.path.exists(self._ruta(url, ancho))
+
+    def fallo_reciente(self, url):
+        """Si la descarga de url falló hace menos de ttl_fallidas segundos"""
+        with self._lock:
+            momento = self._fallidas.get(url)
+            if momento is not None and time.monotonic() - momento > self.ttl_fallidas:
+                del self._fallidas[url]
+                momento = None
+        return momento is not None
+
+    def leer(self, url, ancho):
+        """Retorna los bytes de la portada si ya está en disco (sin descargarla), o None"""
+        ruta = self._ruta(url, ancho)
+        try:
+            with open(ruta, "rb") as f:
+                datos = f.read()
+            os.utime(ruta)  # marca de uso para el LRU
+            return datos
+        except FileNotFoundError:
+            return None
+
+    def obtener(self, url, ancho):
+        """Retorna los bytes de la portada reducida, o None si no se pudo descargar"""
+        datos = self.leer(url, ancho)
+        if datos is not None or self.fallo_reciente(url):
+            return datos
+
+        try:
+            datos = self._descargar(url, ancho)
+        except Exception as e:
+            log.warning("No se pudo descargar la portada %s: %s", url, e)
+            with self._lock:
+                self._fallidas[url] = time.monotonic()
+            return None
+
+        self._guardar(self._ruta(url, ancho), datos)
+        return datos
+
+    def _descargar(self, url, ancho):
+        from PIL import Image
+
+        with urllib.request.urlopen(url, timeout=TIMEOUT_DESCARGA) as respuesta:
+            original = respuesta.read()
+
+        imagen = Image.open(io.BytesIO(original))
+        imagen.thumbnail((ancho, ancho * 2))
+
+        salida = io.BytesIO()
+        imagen.convert("RGB").save(salida, format="JPEG", quality=85, optimize=True)
+        return salida.getvalue()
+
+    def _guardar(self, ruta, datos):
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(datos)
+
+        with self._lock:
+            anterior = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+            os.replace(temporal, ruta)
+            self._total += len(datos) - anterior
+            if self._total > self.max_bytes:
+                self._desalojar()
+
+    def _desalojar(self):
+        """Borra las portadas usadas hace más tiempo hasta quedar bajo el límite"""
+        archivos = []
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                estado = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            archivos.append((estado.st_mtime, estado.st_size, ruta))
+
+        for _, tamaño, ruta in sorted(archivos):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+                self._total -= tamaño
+            except FileNotFoundError:
+                pass
+
+
+class PrecargaPortadas:
+    """
+    Descarga portadas a la caché en segundo plano, con a lo sumo
+    max_hilos descargas simultáneas. Cada precarga tiene una clave (p. ej.
+    la ruleta de un perfil): pedir una nueva con la misma clave cancela lo
+    que quedaba pendiente de la anterior.
+    """
+
+    def __init__(self, cache, max_hilos=HILOS_PRECARGA):
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="precarga-portadas")
+        # RLock: si el futuro ya terminó, su callback corre en este mismo hilo
+        self._lock = threading.RLock()
+        self._tareas = {}
+        self._en_curso = set()
+
+    def precargar(self, clave, urls, ancho):
+        """Encola las portadas que falten; retorna cuántas se encolaron"""
+        self.cancelar(clave)
+
+        futuros = []
+        with self._lock:
+            for url in urls:
+                if not es_url_portada(url):
+                    continue
+                futuro = self._encolar(str(url), ancho)
+                if futuro is not None:
+                    futuros.append(futuro)
+            self._tareas[clave] = futuros
+
+        return len(futuros)
+
+    def descargar(self, url, ancho):
+        """Encola una sola portada, sin clave (no la cancela otra precarga)"""
+        with self._lock:
+            return self._encolar(str(url), ancho) is not None
+
+    def _encolar(self, url, ancho):
+        pendiente = (url, ancho)
+        if pendiente in self._en_curso or self.cache.contiene(*pendiente) or self.cache.fallo_reciente(url):
+            return None
+        self._en_curso.add(pendiente)
+        futuro = self._pool.submit(self.cache.obtener, *pendiente)
+        futuro.add_done_callback(lambda _, p=pendiente: self._terminar(p))
+        return futuro
+
+    def cancelar(self, clave):
+        """Cancela las descargas de esa clave que aún no empezaron"""
+        with self._lock:
+            futuros = self._tareas.pop(clave, [])
+        for futuro in futuros:
+            futuro.cancel()
+
+    def _terminar(self, pendiente):
+        with self._lock:
+            self._en_curso.discard(pendiente)
+
+
+@st.cache_resource
+def obtener_cache_portadas():
+    """Caché única por proceso"""
+    return CachePortadas()
+
+
+@st.cache_resource
+def obtener_precarga_portadas():
+    """Precarga única por proceso (comparte la caché de portadas)"""
+    return PrecargaPortadas(obtener_cache_portadas())
+
+
+def es_url_portada(url):
+    return bool(url) and str(url).startswith("http")
+
+
+def portada(url, ancho):
+    """
+    Imagen para st.image: los bytes de la portada reducida si ya está en
+    la caché. Si no, la URL original (la descarga el navegador, sin frenar
+    el rerun) y la portada se baja en segundo plano para la próxima vez.
+    """
+    datos = obtener_cache_portadas().leer(str(url), ancho)
+    if datos is None:
+        obtener_precarga_portadas().descargar(url, ancho)
+        return url
+    return datos
+
+
+def precargar_portadas(clave, urls, ancho):
+    """Precarga en segundo plano las portadas de urls (ver PrecargaPortadas)"""
+    return obtener_precarga_portadas().precargar(clave, urls, ancho)
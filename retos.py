@@ -4,6 +4,8 @@ import pandas as pd
 from datetime import datetime, timedelta
 import random
 
+from metricas import tramo
+
 RETOS_DISPONIBLES = [
     {
         "id": "leer_3_dias",
@@ -82,10 +84,12 @@ def obtener_inicio_semana():
     return inicio.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
-def obtener_reto_semanal_persistente(perfil, sheet):
+@tramo("reto_semanal")
+def obtener_reto_semanal_persistente(perfil, backend, rng=None):
     """
-    Obtiene el reto de la semana desde Google Sheets.
-    Si no existe o es de otra semana, genera uno nuevo y lo guarda.
+    Obtiene el reto de la semana desde el backend de almacenamiento.
+    Si no existe o es de otra semana, genera uno nuevo (con rng si se pasa)
+    y lo guarda.
     """
     
     inicio_semana = obtener_inicio_semana().strftime("%Y-%m-%d")
@@ -98,15 +102,12 @@ def obtener_reto_semanal_persistente(perfil, sheet):
         # Leer la configuración desde la fila 2 (después del header)
         # Usaremos celdas específicas para guardar los retos
         # Buscar en qué columna están
-        headers = sheet.row_values(1)
+        headers = backend.leer_encabezados()
         
         if col_reto in headers and col_semana in headers:
-            col_reto_idx = headers.index(col_reto) + 1
-            col_semana_idx = headers.index(col_semana) + 1
-            
             # Leer valores actuales (fila 2)
-            reto_actual = sheet.cell(2, col_reto_idx).value
-            semana_actual = sheet.cell(2, col_semana_idx).value
+            reto_actual = backend.leer_celda(2, col_reto)
+            semana_actual = backend.leer_celda(2, col_semana)
             
             # Verificar si es la misma semana
             if semana_actual == inicio_semana and reto_actual in RETOS_POR_ID:
@@ -114,24 +115,26 @@ def obtener_reto_semanal_persistente(perfil, sheet):
                 return RETOS_POR_ID[reto_actual]
             
             # Es otra semana o no hay reto, generar nuevo
-            nuevo_reto = random.choice(RETOS_DISPONIBLES)
+            nuevo_reto = (rng or random).choice(RETOS_DISPONIBLES)
             
-            # Guardar en Google Sheets
-            sheet.update_cell(2, col_reto_idx, nuevo_reto["id"])
-            sheet.update_cell(2, col_semana_idx, inicio_semana)
+            # Guardar en el backend (una sola escritura para ambas celdas)
+            backend.actualizar_celdas([
+                (2, col_reto, nuevo_reto["id"]),
+                (2, col_semana, inicio_semana)
+            ])
             
             return nuevo_reto
         else:
             # Las columnas no existen, usar método de session_state como fallback
-            return obtener_reto_semanal_fallback(perfil)
+            return obtener_reto_semanal_fallback(perfil, rng)
             
     except Exception as e:
         # Si hay error, usar fallback
         st.warning(f"Usando reto temporal: {e}")
-        return obtener_reto_semanal_fallback(perfil)
+        return obtener_reto_semanal_fallback(perfil, rng)
 
 
-def obtener_reto_semanal_fallback(perfil):
+def obtener_reto_semanal_fallback(perfil, rng=None):
     """Fallback usando session_state (se pierde al cerrar)"""
     
     key = f"reto_semanal_{perfil}"
@@ -140,16 +143,53 @@ def obtener_reto_semanal_fallback(perfil):
     inicio_semana = obtener_inicio_semana().date()
     
     if key not in st.session_state or st.session_state.get(key_fecha) != inicio_semana:
-        st.session_state[key] = random.choice(RETOS_DISPONIBLES)
+        st.session_state[key] = (rng or random).choice(RETOS_DISPONIBLES)
         st.session_state[key_fecha] = inicio_semana
         st.session_state[f"reto_completado_{perfil}"] = False
     
     return st.session_state[key]
 
 
-def calcular_progreso_reto(df_perfil, reto):
+def calcular_progreso_reto_resumen(df_perfil, reto, resumen):
+    """Calcula el progreso del reto con el registro de lecturas (solo los días de la semana)"""
+    
+    inicio_semana = obtener_inicio_semana()
+    libros_semana = resumen.libros_entre(inicio_semana.date(), datetime.now().date())
+    
+    progreso = 0
+    
+    if reto["tipo"] == "dias_lectura":
+        progreso = sum(
+            1 for i in range(7)
+            if inicio_semana.date() + timedelta(days=i) in resumen.lecturas_por_dia
+        )
+    
+    elif reto["tipo"] == "minutos":
+        progreso = sum(resumen.duraciones.get(libro_id, 0) for libro_id in libros_semana)
+    
+    elif reto["tipo"] == "libro_nuevo":
+        progreso = len({
+            libro_id for libro_id in libros_semana
+            if resumen.primera_por_libro[libro_id] >= inicio_semana
+        })
+    
+    elif reto["tipo"] == "favorito":
+        if not df_perfil.empty:
+            favoritos = df_perfil[df_perfil["favorito"] == True]
+            progreso = int(favoritos["id"].isin(set(libros_semana)).sum())
+    
+    elif reto["tipo"] == "lecturas":
+        progreso = len(libros_semana)
+    
+    return min(progreso, reto["meta"]), reto["meta"]
+
+
+def calcular_progreso_reto(df_perfil, reto, resumen=None):
     """Calcula el progreso del reto actual"""
     
+    if resumen is not None:
+        return calcular_progreso_reto_resumen(df_perfil, reto, resumen)
+    
     inicio_semana = obtener_inicio_semana()
     
     if df_perfil.empty:
@@ -182,10 +222,10 @@ def calcular_progreso_reto(df_perfil, reto):
     return min(progreso, reto["meta"]), reto["meta"]
 
 
-def verificar_reto_completado(df_perfil, perfil, reto):
+def verificar_reto_completado(df_perfil, perfil, reto, resumen=None):
     """Verifica si el reto se completó y retorna True si es nuevo"""
     
-    progreso, meta = calcular_progreso_reto(df_perfil, reto)
+    progreso, meta = calcular_progreso_reto(df_perfil, reto, resumen)
     
     key_completado = f"reto_completado_{perfil}"
     ya_completado = st.session_state.get(key_completado, False)
@@ -197,19 +237,19 @@ def verificar_reto_completado(df_perfil, perfil, reto):
     return False, None
 
 
-def mostrar_reto_semanal(df_perfil, perfil, sheet=None):
+def mostrar_reto_semanal(df_perfil, perfil, backend=None, resumen=None, rng=None):
     """Muestra el widget del reto semanal"""
     
-    # Obtener reto (persistente si hay sheet, fallback si no)
-    if sheet:
-        reto = obtener_reto_semanal_persistente(perfil, sheet)
+    # Obtener reto (persistente si hay backend, fallback si no)
+    if backend:
+        reto = obtener_reto_semanal_persistente(perfil, backend, rng)
     else:
-        reto = obtener_reto_semanal_fallback(perfil)
+        reto = obtener_reto_semanal_fallback(perfil, rng)
     
     # Guardar en session_state para uso posterior
     st.session_state[f"reto_actual_{perfil}"] = reto
     
-    progreso, meta = calcular_progreso_reto(df_perfil, reto)
+    progreso, meta = calcular_progreso_reto(df_perfil, reto, resumen)
     completado = progreso >= meta
     
     # Marcar como completado si es necesario
@@ -1,74 +1,344 @@
 # sheets.py
-import gspread
+import itertools
+import logging
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
 import streamlit as st
-from oauth2client.service_account import ServiceAccountCredentials
 
+from almacenamiento import (
+    COLUMNAS_ESTADO, asegurar_perfiles, crear_backend, leer_config, migrar_una_vez
+)
+from cola_escritura import BackendDiferido, obtener_cola
+from metricas import ContadorLlamadas, tramo
+
+log = logging.getLogger(__name__)
+
+# Tipos del catálogo, aplicados una vez al cargar. Los textos repetidos van
+# como categorías y los números en el entero más chico que les alcanza;
+# titulo y portada_url quedan como texto. Las marcas del catálogo son
+# booleanos con nulos ("boolean"): una celda vacía queda <NA> y quien las
+# usa decide qué significa. Las columnas de cada lectora (favorito_,
+# veces_, ultima_) las agrega agregar_columnas_perfil.
+ESQUEMA_CATALOGO = {
+    "id": "int32",
+    "idioma": "category",
+    "tipo": "category",
+    "edad_min": "int8",
+    "edad_max": "int8",
+    "duracion_min": "int16",
+    "interactivo": "boolean",
+    "coleccion": "category",
+    "ubicacion": "category",
+    "ultima_lectura": "datetime64[ns]",
+    "veces_leido": "int16",
+    "favorito": "boolean",
+    "activa": "boolean",
+    "ultima_lectora": "category",
+}
+
+# Tipos de las columnas de cada lectora en el catálogo en memoria (un libro
+# sin fila de estado no es favorito: ahí no hay nulos)
+ESQUEMA_ESTADO = {
+    "favorito": "bool",
+    "veces": "int32",
+    "ultima": "datetime64[ns]",
+}
 
-SCOPE = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive"
-]
+# Numera cada carga del catálogo o del registro de lecturas en el proceso
+_CARGAS = itertools.count(1)
 
 
-def get_df(sheet_name="Catalogo Libros Hijas"):
+@tramo("get_df")
+def get_df(hogar=None):
     """
     Devuelve:
-    - df: DataFrame con el catálogo
-    - sheet: objeto sheet para escritura
+    - df: DataFrame con el catálogo del hogar
+    - backend: backend de almacenamiento para escritura
+      (Google Sheets o SQLite local, según [almacenamiento] en secrets)
+    """
+    backend = get_backend(hogar)
+
+    data = backend.leer_registros()
+    df = pd.DataFrame(data)
+
+    # --- CAST DE TIPOS ---
+    # El estado de cada lectora (favorito, veces, última) va aparte: ver get_estado
+    aplicar_esquema(df)
+
+    # Carga y revisión del catálogo en memoria (sube con cada actualizar_libro)
+    marcar_carga(df)
+
+    return df, backend
+
+
+@st.cache_resource
+def migrar_hogar(hogar=None):
+    """
+    Pasa el catálogo del hogar del formato anterior (columnas por perfil)
+    al estado por lectora. Corre una sola vez por proceso, al abrir el
+    hogar, y no en cada carga; entre procesos la coordina la marca de
+    formato del backend (ver migrar_una_vez).
+    """
+    backend = crear_backend(hogar)
+    migradas = migrar_una_vez(backend)
+    # Escrituras de la app: no obligan a recargar lo cacheado
+    obtener_cola(hogar).registrar_propias(backend.revisiones_escritas)
+    return migradas
+
+
+@st.cache_resource
+def backend_revision(hogar=None):
+    """
+    Backend del hogar para leer la revisión en cada rerun, creado una sola
+    vez por proceso (ver get_backend).
+    """
+    return get_backend(hogar)
+
+
+def get_backend(hogar=None):
+    """
+    Devuelve el backend de almacenamiento del hogar sin descargar el catálogo.
+    En Google Sheets reutiliza el cliente y la hoja del pool del proceso.
+
+    Salvo que escritura_diferida = false en [almacenamiento], las escrituras
+    pasan por la cola write-behind del hogar: retornan al instante y se
+    guardan en segundo plano.
+    """
+    backend = crear_backend(hogar)
+    if leer_config(hogar).get("escritura_diferida", True):
+        backend = BackendDiferido(backend, obtener_cola(hogar))
+    # Llamadas al backend por rerun (backend.*), ver metricas
+    return ContadorLlamadas(backend, "backend")
+
+
+def _a_entero(serie):
+    return pd.to_numeric(serie, errors="coerce").fillna(0).astype(int)
+
+
+def _a_bool(serie):
+    return serie.astype(str).str.upper().isin(["TRUE", "1", "SI", "YES"])
+
+
+def _a_booleano(serie):
+    """Como _a_bool, pero una celda vacía queda <NA>"""
+    vacia = serie.isna() | serie.astype(str).str.strip().eq("")
+    return _a_bool(serie.astype(str).str.strip()).astype("boolean").mask(vacia)
+
+
+def aplicar_esquema(df, esquema=ESQUEMA_CATALOGO):
+    """
+    Convierte en el lugar las columnas de df a los tipos del esquema (las
+    que falten se ignoran). Un número que no entra en su tipo se recorta al
+    límite y se avisa en el log: un dato raro en la hoja no impide cargar
+    el resto del catálogo.
+    """
+    for col, tipo in esquema.items():
+        if col not in df.columns:
+            continue
+
+        if tipo == "bool":
+            df[col] = _a_bool(df[col])
+        elif tipo == "boolean":
+            df[col] = _a_booleano(df[col])
+        elif tipo == "category":
+            df[col] = df[col].fillna("").astype(str).astype("category")
+        elif tipo.startswith("datetime"):
+            df[col] = pd.to_datetime(df[col], errors="coerce").astype(tipo)
+        else:
+            valores = _a_entero(df[col])
+            limites = np.iinfo(tipo)
+            fuera = (valores < limites.min) | (valores > limites.max)
+            if fuera.any():
+                log.warning(
+                    "La columna %s tiene %d valores fuera de %s (p. ej. %s); se recortan",
+                    col, int(fuera.sum()), tipo, valores[fuera].iloc[0]
+                )
+                valores = valores.clip(limites.min, limites.max)
+            df[col] = valores.astype(tipo)
+
+    return df
+
+
+def tipo_columna(df, columna):
+    """Tipo de una columna del catálogo en memoria según su esquema (None si no tiene)"""
+    columnas_estado = df.attrs.get("columnas_estado", {})
+    if columna in columnas_estado:
+        return ESQUEMA_ESTADO[columnas_estado[columna][1]]
+    return ESQUEMA_CATALOGO.get(columna)
+
+
+def convertir_valor(valor, tipo, columna=""):
+    """
+    Convierte un valor a escribir al tipo de su columna; ValueError si no
+    se puede (p. ej. un número que no entra en el entero de la columna).
+    Las fechas se guardan al segundo, como quedan en la hoja.
+    """
+    if tipo is None:
+        return valor
+    if tipo in ("bool", "boolean"):
+        if tipo == "boolean" and (valor is None or valor == "" or (not isinstance(valor, str) and pd.isna(valor))):
+            return pd.NA
+        if isinstance(valor, str):
+            return valor.strip().upper() in ["TRUE", "1", "SI", "YES"]
+        return bool(valor)
+    if tipo == "category":
+        return "" if valor is None else str(valor)
+    if tipo.startswith("datetime"):
+        if valor is None or valor == "" or (not isinstance(valor, str) and pd.isna(valor)):
+            return pd.NaT
+        try:
+            return pd.Timestamp(valor).floor("s")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Fecha inválida para {columna}: {valor!r}") from e
+
+    try:
+        entero = int(valor)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Número inválido para {columna}: {valor!r}") from e
+    limites = np.iinfo(tipo)
+    if not limites.min <= entero <= limites.max:
+        raise ValueError(f"{columna} = {entero} no entra en {tipo}")
+    return entero
+
+
+def get_perfiles(backend, iniciales):
+    """
+    Lectoras registradas como dict {nombre: icono}.
+    Si no hay ninguna se registran las iniciales ({nombre: icono}).
     """
+    return asegurar_perfiles(backend, iniciales)
 
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        st.secrets["gcp_service_account"],
-        SCOPE
+
+def columnas_en_conflicto(perfil, columnas):
+    """
+    Columnas del perfil (favorito_, veces_, ultima_) que ya son columnas
+    del catálogo: p. ej. la lectora "leido" daría veces_leido.
+    """
+    return [col for col in get_columnas_perfil(perfil).values() if col in columnas]
+
+
+def registrar_perfil(backend, nombre, icono):
+    """
+    Registra una lectora nueva; ValueError si el nombre está vacío, ya
+    existe o sus columnas pisarían columnas del catálogo.
+    """
+    nombre = nombre.strip()
+    if not nombre:
+        raise ValueError("El nombre no puede estar vacío")
+    if nombre.lower() in {str(p["nombre"]).lower() for p in backend.leer_perfiles()}:
+        raise ValueError(f"Ya existe una lectora llamada {nombre}")
+    if columnas_en_conflicto(nombre, set(ESQUEMA_CATALOGO) | set(backend.leer_encabezados())):
+        raise ValueError(f"El nombre {nombre} choca con columnas del catálogo; elige otro")
+    backend.agregar_perfil(nombre, icono)
+
+
+def get_estado(backend, perfil):
+    """
+    Estado de lectura de un perfil, descargando solo sus filas.
+    DataFrame con libro_id (int), favorito (bool), veces (int) y ultima (datetime).
+    """
+    estado = pd.DataFrame(backend.leer_estado(perfil), columns=COLUMNAS_ESTADO)
+
+    estado["libro_id"] = _a_entero(estado["libro_id"])
+    estado["favorito"] = _a_bool(estado["favorito"])
+    estado["veces"] = _a_entero(estado["veces"])
+    estado["ultima"] = pd.to_datetime(estado["ultima"], errors="coerce")
+
+    return estado
+
+
+def refrescar_estado_libro(backend, df, perfil, libro_id):
+    """
+    Relee del backend el estado de la lectora para un libro y lo aplica
+    sobre df en el lugar, así un toque desde otro dispositivo desde la
+    última carga no se pisa al escribir. Retorna {favorito, veces, ultima}.
+    """
+    fila = backend.leer_estado_libro(perfil, libro_id)
+    estado = {
+        "favorito": bool(_a_bool(pd.Series([fila["favorito"]])).iloc[0]),
+        "veces": int(_a_entero(pd.Series([fila["veces"]])).iloc[0]),
+        "ultima": pd.to_datetime(fila["ultima"] or None, errors="coerce"),
+    }
+
+    cols = get_columnas_perfil(perfil)
+    idx = df.index[df["id"] == libro_id][0]
+    cambio = False
+    for campo, valor in estado.items():
+        actual = df.at[idx, cols[campo]]
+        if formatear_valor(actual) != formatear_valor(valor):
+            df.loc[idx, cols[campo]] = valor
+            cambio = True
+    if cambio:
+        df.attrs["revision"] = get_revision(df) + 1
+
+    return estado
+
+
+def tiene_perfil(df, perfil):
+    """Si el catálogo en memoria ya tiene las columnas del perfil"""
+    return get_columnas_perfil(perfil)["veces"] in df.columns
+
+
+def agregar_columnas_perfil(df, perfil, estado):
+    """
+    Agrega al catálogo en memoria (en el lugar) las columnas favorito_,
+    veces_ y ultima_ del perfil a partir de su estado; los libros sin fila
+    quedan sin leer. El resto de la app sigue usando get_columnas_perfil,
+    pero solo se descargan los perfiles que se usan.
+    """
+    cols = get_columnas_perfil(perfil)
+    # Una lectora registrada antes de validar el nombre no pisa el catálogo
+    columnas_estado = dict(df.attrs.get("columnas_estado", {}))
+    conflicto = columnas_en_conflicto(perfil, set(df.columns) - set(columnas_estado))
+    if conflicto:
+        raise ValueError(f"Las columnas de la lectora {perfil} pisarían las del catálogo: {conflicto}")
+
+    alineado = (
+        estado.drop_duplicates("libro_id", keep="last")
+        .set_index("libro_id")
+        .reindex(df["id"].to_numpy())
     )
 
-    client = gspread.authorize(creds)
-    sheet = client.open(sheet_name).sheet1
+    df[cols["favorito"]] = alineado["favorito"].eq(True).to_numpy()
+    df[cols["veces"]] = alineado["veces"].fillna(0).astype("int32").to_numpy()
+    df[cols["ultima"]] = pd.to_datetime(alineado["ultima"]).astype(ESQUEMA_ESTADO["ultima"]).to_numpy()
 
-    data = sheet.get_all_records()
-    df = pd.DataFrame(data)
+    # Columnas que actualizar_libro escribe en el estado y no en el catálogo
+    for campo, columna in zip(["favorito", "veces", "ultima"], cols.values()):
+        columnas_estado[columna] = (perfil.lower(), campo)
+    df.attrs["columnas_estado"] = columnas_estado
+    df.attrs["revision"] = get_revision(df) + 1
 
-    # --- CAST DE TIPOS ---
-    INT_COLS = [
-        "id",
-        "edad_min",
-        "edad_max",
-        "duracion_min",
-        "veces_clara",      # NUEVO
-        "veces_gracia"      # NUEVO
-    ]
-
-    BOOL_COLS = [
-        "interactivo",
-        "activa",
-        "favorito_clara",   # NUEVO
-        "favorito_gracia"   # NUEVO
-    ]
-
-    DATE_COLS = [
-        "ultima_clara",     # NUEVO
-        "ultima_gracia"     # NUEVO
-    ]
-
-    for col in INT_COLS:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
-
-    for col in BOOL_COLS:
-        if col in df.columns:
-            df[col] = (
-                df[col]
-                .astype(str)
-                .str.upper()
-                .isin(["TRUE", "1", "SI", "YES"])
-            )
-
-    for col in DATE_COLS:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
-
-    return df, sheet
+    return df
+
+
+def nueva_carga():
+    """Número de carga que no se repite en el proceso"""
+    return next(_CARGAS)
+
+
+def marcar_carga(df):
+    """
+    Numera una carga del catálogo (de get_df o de la instantánea) y
+    reinicia su revisión en memoria. La revisión vuelve a 0 en cada carga
+    y el id de un objeto se reutiliza: lo derivado del catálogo se guarda
+    con (get_carga, get_revision).
+    """
+    df.attrs["carga"] = nueva_carga()
+    df.attrs["revision"] = 0
+    return df
+
+
+def get_carga(df):
+    """Número de la carga de la que salió el catálogo en memoria"""
+    return df.attrs.get("carga", 0)
+
+
+def get_revision(df):
+    """Revisión del catálogo en memoria, para invalidar lo derivado de él"""
+    return df.attrs.get("revision", 0)
 
 
 def get_columnas_perfil(perfil):
@@ -79,3 +349,83 @@ def get_columnas_perfil(perfil):
         "veces": f"veces_{perfil_lower}",
         "ultima": f"ultima_{perfil_lower}"
     }
+
+
+def formatear_valor(valor):
+    """Convierte un valor del DataFrame al texto que se guarda en la hoja"""
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    if isinstance(valor, (pd.Timestamp, datetime)):
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    if hasattr(valor, "item"):
+        # Escalares numpy (int64, bool_, ...)
+        return formatear_valor(valor.item())
+    return str(valor)
+
+
+def get_cambios_libro(df, libro_id, valores):
+    """
+    Calcula las celdas que cambian para un libro.
+    - df: catálogo tal como lo devuelve get_df (índice = fila de datos)
+    - valores: dict {columna: nuevo valor}
+    Retorna lista de (fila, columna, valor) solo con las celdas distintas.
+    """
+    indices = df.index[df["id"] == libro_id]
+    if len(indices) == 0:
+        raise KeyError(f"No existe el libro con id {libro_id}")
+
+    idx = indices[0]
+    fila = int(idx) + 2  # fila 1 = encabezados
+
+    cambios = []
+    for columna, valor in valores.items():
+        nuevo = formatear_valor(valor)
+        actual = formatear_valor(df.at[idx, columna]) if columna in df.columns else None
+        if actual != nuevo:
+            cambios.append((fila, columna, nuevo))
+
+    return cambios
+
+
+def actualizar_libro(backend, df, libro_id, valores):
+    """
+    Escribe en el backend solo las celdas modificadas de un libro y
+    aplica los mismos cambios sobre df en el lugar (actualización
+    optimista del catálogo en memoria, sin volver a descargarlo).
+    Las columnas de un perfil se guardan en su estado de lectura.
+    Los valores se convierten antes al tipo de su columna: uno que no entra
+    es un ValueError y no se escribe nada.
+    """
+    valores = {
+        columna: convertir_valor(valor, tipo_columna(df, columna), columna)
+        for columna, valor in valores.items()
+    }
+    cambios = get_cambios_libro(df, libro_id, valores)
+    if cambios:
+        columnas_estado = df.attrs.get("columnas_estado", {})
+
+        celdas = [cambio for cambio in cambios if cambio[1] not in columnas_estado]
+        if celdas:
+            backend.actualizar_celdas(celdas)
+
+        estado = {}
+        for _, columna, valor in cambios:
+            if columna in columnas_estado:
+                perfil, campo = columnas_estado[columna]
+                estado.setdefault(perfil, []).append((int(libro_id), campo, valor))
+        for perfil, cambios_estado in estado.items():
+            backend.guardar_estado(perfil, cambios_estado)
+
+        idx = df.index[df["id"] == libro_id][0]
+        for _, columna, _ in cambios:
+            valor = valores[columna]
+            # Un texto nuevo en una columna categórica necesita su categoría
+            if (columna in df.columns and isinstance(df[columna].dtype, pd.CategoricalDtype)
+                    and valor not in df[columna].cat.categories):
+                df[columna] = df[columna].cat.add_categories([valor])
+            df.loc[idx, columna] = valor
+        df.attrs["revision"] = get_revision(df) + 1
+
+    return cambios
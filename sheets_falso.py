@@ -0,0 +1,300 @@
+# sheets_falso.py
+"""
+Google Sheets falso, en memoria, para probar la app y medir sin cuenta de
+Google. Implementa los métodos de gspread que usa BackendSheets y se
+enchufa en su PoolSheets, así que todo el resto del código (pool,
+contadores, cola de escritura) corre igual que en producción.
+
+Se activa con backend = "sheets_falso" en [almacenamiento] (o
+LECTURA_BACKEND=sheets_falso) y admite:
+- latencia_ms / jitter_ms: demora de cada llamada (latencia ± jitter)
+- prob_cuota: probabilidad de que una llamada falle con un 429
+- cuota_por_minuto: llamadas por minuto antes de responder 429 (0 = sin tope)
+- csv: catálogo con el que se siembra la primera hoja de cada spreadsheet
+"""
+import csv
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+from almacenamiento import CSV_SEMILLA, PoolSheets
+
+_A1 = re.compile(r"^([A-Z]+)(\d+)$")
+
+
+def a1_a_fila_columna(etiqueta):
+    """'B3' -> (3, 2)"""
+    letras, fila = _A1.match(etiqueta.split(":")[0].upper()).groups()
+    columna = 0
+    for letra in letras:
+        columna = columna * 26 + ord(letra) - ord("A") + 1
+    return int(fila), columna
+
+
+def _a_texto(valor):
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    return "" if valor is None else str(valor)
+
+
+def _numerizar(valor):
+    """Como get_all_records: enteros y decimales como números, el resto como texto"""
+    for tipo in (int, float):
+        try:
+            return tipo(valor)
+        except ValueError:
+            pass
+    return valor
+
+
+def _sin_vacios_al_final(valores):
+    while valores and valores[-1] == "":
+        valores = valores[:-1]
+    return valores
+
+
+def error_cuota():
+    """El APIError que da gspread cuando Google responde 429"""
+    import requests
+    from gspread.exceptions import APIError
+
+    respuesta = requests.Response()
+    respuesta.status_code = 429
+    respuesta._content = json.dumps({"error": {
+        "code": 429,
+        "message": "Quota exceeded for quota metric 'Read requests' (hoja falsa)",
+        "status": "RESOURCE_EXHAUSTED",
+    }}).encode()
+    return APIError(respuesta)
+
+
+# ---------------- RED SIMULADA ----------------
+class Red:
+    """Demora y errores de cuota compartidos por todas las llamadas del cliente"""
+
+    def __init__(self, latencia_ms=0, jitter_ms=0, prob_cuota=0.0, cuota_por_minuto=0, semilla=None):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.prob_cuota = prob_cuota
+        self.cuota_por_minuto = cuota_por_minuto
+        self.llamadas = 0
+        self.errores = 0
+        self._rng = random.Random(semilla)
+        self._recientes = deque()
+        self._lock = threading.Lock()
+
+    def llamada(self):
+        """Una llamada a la API: espera la latencia y quizás falla con 429"""
+        with self._lock:
+            self.llamadas += 1
+            demora = max(self.latencia_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms), 0)
+            ahora = time.monotonic()
+            while self._recientes and ahora - self._recientes[0] > 60:
+                self._recientes.popleft()
+            excedida = self.cuota_por_minuto and len(self._recientes) >= self.cuota_por_minuto
+            falla = excedida or self._rng.random() < self.prob_cuota
+            if falla:
+                self.errores += 1
+            else:
+                self._recientes.append(ahora)
+
+        time.sleep(demora / 1000)
+        if falla:
+            raise error_cuota()
+
+
+# ---------------- HOJAS ----------------
+class CeldaFalsa:
+    def __init__(self, fila, columna, valor):
+        self.row = fila
+        self.col = columna
+        self.value = valor if valor != "" else None
+
+
+class HojaFalsa:
+    """Worksheet en memoria: una grilla de textos, como la ve gspread"""
+
+    def __init__(self, red, titulo, filas=None):
+        self.red = red
+        self.title = titulo
+        self._filas = [[_a_texto(v) for v in fila] for fila in (filas or [])]
+        self._lock = threading.Lock()
+
+    def _escribir(self, fila, columna, valor):
+        while len(self._filas) < fila:
+            self._filas.append([])
+        celdas = self._filas[fila - 1]
+        while len(celdas) < columna:
+            celdas.append("")
+        celdas[columna - 1] = _a_texto(valor)
+
+    def _leer(self, fila, columna):
+        if fila > len(self._filas) or columna > len(self._filas[fila - 1]):
+            return ""
+        return self._filas[fila - 1][columna - 1]
+
+    @property
+    def row_count(self):
+        return max(len(self._filas), 1)
+
+    @property
+    def col_count(self):
+        return max([len(fila) for fila in self._filas] + [1])
+
+    def _ultima_fila(self):
+        for i in range(len(self._filas), 0, -1):
+            if any(self._filas[i - 1]):
+                return i
+        return 0
+
+    # --- Lectura ---
+    def get_all_records(self):
+        self.red.llamada()
+        with self._lock:
+            if not self._filas:
+                return []
+            encabezados = _sin_vacios_al_final(self._filas[0])
+            return [
+                {
+                    col: _numerizar(fila[i]) if i < len(fila) and fila[i] != "" else ""
+                    for i, col in enumerate(encabezados)
+                }
+                for fila in self._filas[1:self._ultima_fila()]
+            ]
+
+    def row_values(self, fila):
+        self.red.llamada()
+        with self._lock:
+            return _sin_vacios_al_final(list(self._filas[fila - 1])) if fila <= len(self._filas) else []
+
+    def col_values(self, columna):
+        self.red.llamada()
+        with self._lock:
+            return _sin_vacios_al_final([self._leer(i, columna) for i in range(1, len(self._filas) + 1)])
+
+    def cell(self, fila, columna):
+        self.red.llamada()
+        with self._lock:
+            return CeldaFalsa(fila, columna, self._leer(fila, columna))
+
+    def acell(self, etiqueta):
+        return self.cell(*a1_a_fila_columna(etiqueta))
+
+    # --- Escritura ---
+    def update_cell(self, fila, columna, valor):
+        self.red.llamada()
+        with self._lock:
+            self._escribir(fila, columna, valor)
+
+    def update_acell(self, etiqueta, valor):
+        self.update_cell(*a1_a_fila_columna(etiqueta), valor)
+
+    def update(self, valores, range_name=None):
+        self.red.llamada()
+        fila0, columna0 = a1_a_fila_columna(range_name) if range_name else (1, 1)
+        with self._lock:
+            for i, fila in enumerate(valores):
+                for j, valor in enumerate(fila):
+                    self._escribir(fila0 + i, columna0 + j, valor)
+
+    def batch_update(self, datos):
+        self.red.llamada()
+        with self._lock:
+            for dato in datos:
+                fila0, columna0 = a1_a_fila_columna(dato["range"])
+                for i, fila in enumerate(dato["values"]):
+                    for j, valor in enumerate(fila):
+                        self._escribir(fila0 + i, columna0 + j, valor)
+
+    def append_row(self, valores):
+        self.append_rows([valores])
+
+    def append_rows(self, filas):
+        self.red.llamada()
+        with self._lock:
+            del self._filas[self._ultima_fila():]
+            self._filas.extend([_a_texto(v) for v in fila] for fila in filas)
+
+    def batch_clear(self, rangos):
+        self.red.llamada()
+        with self._lock:
+            for rango in rangos:
+                inicio, fin = rango.split(":")
+                fila0, columna0 = a1_a_fila_columna(inicio)
+                fila1, columna1 = a1_a_fila_columna(fin)
+                for fila in range(fila0, min(fila1, len(self._filas)) + 1):
+                    celdas = self._filas[fila - 1]
+                    for columna in range(columna0, min(columna1, len(celdas)) + 1):
+                        celdas[columna - 1] = ""
+
+    def clear(self):
+        self.red.llamada()
+        with self._lock:
+            self._filas = []
+
+
+class SpreadsheetFalso:
+    def __init__(self, red, nombre, filas_catalogo):
+        self.red = red
+        self.title = nombre
+        self._hojas = [HojaFalsa(red, "Hoja 1", filas_catalogo)]
+        self._lock = threading.Lock()
+
+    @property
+    def sheet1(self):
+        return self.get_worksheet(0)
+
+    def get_worksheet(self, indice):
+        self.red.llamada()
+        return self._hojas[indice]
+
+    def worksheet(self, titulo):
+        from gspread.exceptions import WorksheetNotFound
+
+        self.red.llamada()
+        with self._lock:
+            for hoja in self._hojas:
+                if hoja.title == titulo:
+                    return hoja
+        raise WorksheetNotFound(titulo)
+
+    def add_worksheet(self, titulo, rows, cols):
+        self.red.llamada()
+        with self._lock:
+            hoja = HojaFalsa(self.red, titulo)
+            self._hojas.append(hoja)
+            return hoja
+
+
+class ClienteFalso:
+    """Cliente gspread falso: cada spreadsheet nuevo se siembra con el catálogo del CSV"""
+
+    def __init__(self, red, csv_semilla=CSV_SEMILLA):
+        self.red = red
+        self.csv_semilla = csv_semilla
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    def open(self, nombre):
+        self.red.llamada()
+        with self._lock:
+            if nombre not in self._spreadsheets:
+                with open(self.csv_semilla, newline="", encoding="utf-8") as f:
+                    filas = list(csv.reader(f))
+                self._spreadsheets[nombre] = SpreadsheetFalso(self.red, nombre, filas)
+            return self._spreadsheets[nombre]
+
+
+@st.cache_resource
+def obtener_pool_falso(latencia_ms=0, jitter_ms=0, prob_cuota=0.0, cuota_por_minuto=0, csv_semilla=CSV_SEMILLA):
+    """
+    PoolSheets con un ClienteFalso, único por proceso y configuración
+    (los datos viven mientras viva el proceso).
+    """
+    red = Red(latencia_ms, jitter_ms, prob_cuota, cuota_por_minuto)
+    return PoolSheets(crear_cliente=lambda: ClienteFalso(red, csv_semilla))